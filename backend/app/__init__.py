@@ -4,6 +4,9 @@ from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 import os
+import hashlib
+import json
+import tempfile
 
 # Create extensions
 db = SQLAlchemy()
@@ -39,6 +42,79 @@ def create_app():
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 86400  # 24 hours in seconds
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = 2592000  # 30 days in seconds
     
+    # Shared rate table read by every worker on this host (empty disables it)
+    db_key = hashlib.sha1(app.config['SQLALCHEMY_DATABASE_URI'].encode('utf-8')).hexdigest()[:12]
+    app.config['RATE_TABLE_PATH'] = os.environ.get(
+        'RATE_TABLE_PATH',
+        os.path.join(tempfile.gettempdir(), f'construction_estimator_rates_{db_key}.bin')
+    )
+    
+    # Memoized estimate results
+    app.config['ESTIMATE_CACHE_SIZE'] = int(os.environ.get('ESTIMATE_CACHE_SIZE', 10000))
+    app.config['ESTIMATE_CACHE_TTL'] = int(os.environ.get('ESTIMATE_CACHE_TTL', 3600))  # seconds
+    
+    # Estimate persistence: 'sync' commits per request, 'batched' uses the
+    # write-behind queue in app.persistence
+    app.config['ESTIMATE_WRITE_MODE'] = os.environ.get('ESTIMATE_WRITE_MODE', 'sync')
+    app.config['ESTIMATE_FLUSH_ROWS'] = int(os.environ.get('ESTIMATE_FLUSH_ROWS', 500))
+    app.config['ESTIMATE_FLUSH_MS'] = int(os.environ.get('ESTIMATE_FLUSH_MS', 200))
+    app.config['ESTIMATE_ID_BLOCK'] = int(os.environ.get('ESTIMATE_ID_BLOCK', 1000))
+    # Rows the batched writer could not insert are kept here and replayed
+    app.config['ESTIMATE_SPILL_PATH'] = os.environ.get(
+        'ESTIMATE_SPILL_PATH',
+        os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'estimate_spill.jsonl'))
+    )
+    
+    # Idempotency-Key replay window (seconds), in-process replay cache size,
+    # and how long (seconds) an unfinished claim blocks retries of its key
+    app.config['IDEMPOTENCY_TTL'] = int(os.environ.get('IDEMPOTENCY_TTL', 86400))
+    app.config['IDEMPOTENCY_CACHE_SIZE'] = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10000))
+    app.config['IDEMPOTENCY_LEASE'] = int(os.environ.get('IDEMPOTENCY_LEASE', 30))
+    
+    # Cached user lookups for admin_required, /auth/profile and /auth/refresh;
+    # other processes see admin changes to a user within the TTL (seconds)
+    app.config['PRINCIPAL_CACHE_SIZE'] = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+    app.config['PRINCIPAL_CACHE_TTL'] = int(os.environ.get('PRINCIPAL_CACHE_TTL', 30))
+    
+    # Migrate and seed at startup when the schema version is behind (run.py
+    # turns this on for the development server)
+    app.config['AUTO_MIGRATE'] = os.environ.get('AUTO_MIGRATE', '0') != '0'
+    
+    # Rate limits: budgets are in config.py; the store is 'memory' (buckets
+    # per process) or 'shared' (one bucket table for all workers on the host)
+    from config import Config
+    app.config['RATE_LIMITS'] = Config.RATE_LIMITS
+    app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+    app.config['RATE_LIMIT_STORE'] = os.environ.get('RATE_LIMIT_STORE', 'memory')
+    app.config['RATE_LIMIT_PATH'] = os.environ.get(
+        'RATE_LIMIT_PATH',
+        os.path.join(tempfile.gettempdir(), f'construction_estimator_ratelimit_{db_key}.bin')
+    )
+    
+    # Revoked tokens: how often each process picks up revocations made by
+    # other processes, and how often expired ones are purged (seconds)
+    app.config['REVOCATION_SYNC_SECONDS'] = float(os.environ.get('REVOCATION_SYNC_SECONDS', 5))
+    app.config['REVOCATION_PRUNE_SECONDS'] = int(os.environ.get('REVOCATION_PRUNE_SECONDS', 3600))
+    
+    # Password hashing: bcrypt cost, worker processes (0 hashes on the request
+    # thread) and how many hashes may wait before /login answers 503
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE',
+                                                           app.config['PASSWORD_HASH_WORKERS'] * 8))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    
+    # Bulk repricing jobs: rows per chunk transaction and a pause between
+    # chunks to leave headroom for live traffic
+    app.config['REPRICE_CHUNK_ROWS'] = int(os.environ.get('REPRICE_CHUNK_ROWS', 500))
+    app.config['REPRICE_PAUSE_MS'] = int(os.environ.get('REPRICE_PAUSE_MS', 0))
+    
+    # Monte Carlo bands for /calculate with "simulate": true. Distributions
+    # override app.simulation.DEFAULT_DISTRIBUTIONS, e.g.
+    # {"labor_rate": {"dist": "uniform", "low": 0.9, "high": 1.2}}
+    app.config['SIMULATION_SAMPLES'] = int(os.environ.get('SIMULATION_SAMPLES', 10000))
+    app.config['SIMULATION_DISTRIBUTIONS'] = json.loads(os.environ.get('SIMULATION_DISTRIBUTIONS', '{}'))
+    
     # Ensure upload folder exists
     upload_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
     os.makedirs(upload_folder, exist_ok=True)
@@ -50,6 +126,10 @@ def create_app():
     bcrypt.init_app(app)
     jwt.init_app(app)
     
+    # Reject revoked tokens (logout, deactivated or deleted users)
+    from app import revocation
+    jwt.token_in_blocklist_loader(lambda jwt_header, jwt_payload: revocation.is_revoked(jwt_payload))
+    
     # Configure CORS
     CORS(app, supports_credentials=True, origins=["http://localhost:3000"])
     
@@ -62,9 +142,14 @@ def create_app():
     app.register_blueprint(estimate_bp, url_prefix='/api/estimate')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
     
-    # Create database tables
+    # Check the schema version (one query); tables and seed data are
+    # created by `python -m app.cli migrate`, or here when AUTO_MIGRATE is on
     with app.app_context():
-        create_tables()
+        from app import schema
+        schema.check(auto_migrate=app.config['AUTO_MIGRATE'])
+    
+    from app import persistence
+    persistence.init_app(app)
     
     # Error handlers
     @app.errorhandler(404)
@@ -77,35 +162,61 @@ def create_app():
     
     return app
 
-def create_tables():
-    """Create database tables and seed initial data"""
+def create_tables(seed=True):
+    """Create missing tables, backfill summary tables and seed initial data"""
     try:
         # Import models inside function to avoid circular imports
-        from app.database import City, Material, User, Estimate
+        from app.database import City, Material, User, Estimate, IdBlock
+        from app.database import StatCounter, EstimateRollup
+        from app.database import CostModelVersion, CostModelParam, EstimateGraph, RepriceJob
+        from app.database import MaterialRateHistory, CityRateHistory, IdempotencyKey, RevokedToken
+        from app.database import SchemaVersion
         
         # Create all tables
         db.create_all()
         print("✅ Database tables created successfully!")
         
+        # Backfill summary tables for databases created before they existed
+        # (or before the estimate totals were sharded)
+        if StatCounter.query.first() is None or (
+                EstimateRollup.query.first() is None and Estimate.query.first() is not None) or (
+                StatCounter.query.filter(StatCounter.name.like('estimates#%')).first() is None):
+            from app import rollups
+            rollups.rebuild(db.session)
+            db.session.commit()
+            print("✅ Summary tables rebuilt")
+        
         # Seed initial data
-        seed_initial_data()
+        if seed:
+            seed_initial_data()
+        
+        # Baseline rate history for rates recorded before it was kept
+        from app import rate_history
+        if rate_history.backfill(db.session):
+            db.session.commit()
+            print("✅ Rate history baseline recorded")
         
     except Exception as e:
-        print(f"⚠️  Error creating tables: {str(e)}")
-        print("This is normal if the database doesn't exist yet.")
-        print("\n🔧 Please create the database manually:")
-        print("1. Open XAMPP Control Panel")
-        print("2. Start MySQL service")
-        print("3. Open phpMyAdmin: http://localhost/phpmyadmin")
-        print("4. Create database: 'construction_estimator'")
-        print("5. Collation: utf8mb4_general_ci")
-        print("\nThen restart the server.")
+        db.session.rollback()
+        print_database_help(e)
         return False
     return True
 
+def print_database_help(error):
+    print(f"⚠️  Error creating tables: {str(error)}")
+    print("This is normal if the database doesn't exist yet.")
+    print("\n🔧 Please create the database manually:")
+    print("1. Open XAMPP Control Panel")
+    print("2. Start MySQL service")
+    print("3. Open phpMyAdmin: http://localhost/phpmyadmin")
+    print("4. Create database: 'construction_estimator'")
+    print("5. Collation: utf8mb4_general_ci")
+    print("\nThen restart the server.")
+
 def seed_initial_data():
     """Seed database with initial data - 2024 prices"""
     from app.database import City, Material, User
+    from app.rollups import bump
     
     try:
         # Check if database is empty
@@ -118,6 +229,7 @@ def seed_initial_data():
             ]
             for city in cities:
                 db.session.add(city)
+            bump(db.session, cities=len(cities))
             print("✅ Cities added with 2024 prices")
         else:
             print("✅ Cities already exist in database")
@@ -135,6 +247,7 @@ def seed_initial_data():
             ]
             for material in materials:
                 db.session.add(material)
+            bump(db.session, materials=len(materials))
             print("✅ Materials added with 2024 prices")
         else:
             print("✅ Materials already exist in database")
@@ -148,6 +261,7 @@ def seed_initial_data():
             )
             admin.set_password('admin123')
             db.session.add(admin)
+            bump(db.session, users=1, active_users=1)
             print("✅ Admin user created")
         else:
             print("✅ Admin user already exists")
@@ -161,6 +275,7 @@ def seed_initial_data():
             )
             user.set_password('password123')
             db.session.add(user)
+            bump(db.session, users=1, active_users=1)
             print("✅ Test user created")
         else:
             print("✅ Test user already exists")
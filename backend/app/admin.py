@@ -1,8 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app import db
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.database import Material, City, User, Estimate
-from datetime import datetime
+from app.database import Material, City, User, Estimate, EstimateRollup, CostModelVersion, CostModelParam
+from app.database import EstimateGraph, RepriceJob
+from app.database import estimate_with_user_query, estimate_with_user_row_to_dict
+from app.engine import DEFAULT_COST_MODEL
+from app.export import EXPORT_FORMATS, export_filters, export_response
+from app.pagination import keyset_page, wants_cursor, wants_total
+from app.persistence import await_flush
+from app.principals import get_principal, invalidate as invalidate_principal
+from app.rate_history import record_city, record_material
+from app.rates import refresh_rates
+from app.revocation import revoke_user
+from app.rollups import bump, read_counters, read_day, record_estimates
+from datetime import date, datetime, timedelta
 from sqlalchemy import func
 
 admin_bp = Blueprint('admin', __name__)
@@ -27,9 +38,10 @@ def admin_required(f):
                 except (ValueError, TypeError):
                     return jsonify({'success': False, 'error': 'Invalid token format'}), 401
             
-            user = User.query.get(user_id)
+            # Cached user fields; no query unless the cache entry expired
+            user = get_principal(user_id)
             
-            if not user or user.role != 'admin':
+            if not user or user['role'] != 'admin' or not user['is_active']:
                 return jsonify({'success': False, 'error': 'Admin access required'}), 403
             return f(*args, **kwargs)
         except Exception as e:
@@ -37,33 +49,37 @@ def admin_required(f):
             return jsonify({'success': False, 'error': str(e)}), 500
     return decorated_function
 
+def estimate_counts(user_ids):
+    """Map user id -> number of estimates, using one GROUP BY over the index on user_id"""
+    if not user_ids:
+        return {}
+    rows = db.session.query(Estimate.user_id, func.count(Estimate.id))\
+        .filter(Estimate.user_id.in_(user_ids))\
+        .group_by(Estimate.user_id)\
+        .all()
+    return dict(rows)
+
 # ========== DASHBOARD ==========
 @admin_bp.route('/dashboard', methods=['GET'])
 @admin_required
 def get_dashboard():
     """Get admin dashboard statistics"""
     try:
-        # Count statistics
-        total_users = User.query.count()
-        total_estimates = Estimate.query.count()
-        total_materials = Material.query.count()
+        # Count statistics from the summary table
+        counters = read_counters(db.session)
+        total_users = int(counters['users'])
+        total_estimates = int(counters['estimates'])
+        total_materials = int(counters['materials'])
         
         # Total cost sum
-        total_cost_result = db.session.query(func.sum(Estimate.total_cost)).scalar() or 0
+        total_cost_result = counters['estimate_cost']
         
-        # Recent estimates (last 5 with user info)
-        recent_estimates = Estimate.query\
+        # Recent estimates (last 5 with user info, one joined query)
+        recent_estimates = estimate_with_user_query()\
             .order_by(Estimate.created_at.desc())\
             .limit(5)\
             .all()
-        
-        # Format recent estimates with user info
-        recent_estimates_data = []
-        for estimate in recent_estimates:
-            user = User.query.get(estimate.user_id)
-            estimate_data = estimate.to_dict()
-            estimate_data['user'] = user.to_dict() if user else None
-            recent_estimates_data.append(estimate_data)
+        recent_estimates_data = [estimate_with_user_row_to_dict(row) for row in recent_estimates]
         
         return jsonify({
             'success': True,
@@ -121,7 +137,9 @@ def update_material(material_id):
         if 'unit' in data:
             material.unit = data['unit']
         
+        record_material(db.session, material)
         db.session.commit()
+        refresh_rates()
         
         return jsonify({
             'success': True,
@@ -161,7 +179,11 @@ def create_material():
         )
         
         db.session.add(material)
+        db.session.flush()
+        record_material(db.session, material)
+        bump(db.session, materials=1)
         db.session.commit()
+        refresh_rates()
         
         return jsonify({
             'success': True,
@@ -183,8 +205,11 @@ def delete_material(material_id):
         if not material:
             return jsonify({'success': False, 'error': 'Material not found'}), 404
         
+        record_material(db.session, material, removed=True)
         db.session.delete(material)
+        bump(db.session, materials=-1)
         db.session.commit()
+        refresh_rates()
         
         return jsonify({
             'success': True,
@@ -234,7 +259,9 @@ def update_city(city_id):
         if 'code' in data:
             city.code = data['code']
         
+        record_city(db.session, city)
         db.session.commit()
+        refresh_rates()
         
         return jsonify({
             'success': True,
@@ -273,7 +300,11 @@ def create_city():
         )
         
         db.session.add(city)
+        db.session.flush()
+        record_city(db.session, city)
+        bump(db.session, cities=1)
         db.session.commit()
+        refresh_rates()
         
         return jsonify({
             'success': True,
@@ -295,8 +326,11 @@ def delete_city(city_id):
         if not city:
             return jsonify({'success': False, 'error': 'City not found'}), 404
         
+        record_city(db.session, city, removed=True)
         db.session.delete(city)
+        bump(db.session, cities=-1)
         db.session.commit()
+        refresh_rates()
         
         return jsonify({
             'success': True,
@@ -307,6 +341,221 @@ def delete_city(city_id):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ========== COST MODEL ==========
+def cost_model_dict(version):
+    """Global values and per-city overrides of a cost model version"""
+    params = dict(DEFAULT_COST_MODEL)
+    overrides = {}
+    for param in CostModelParam.query.filter_by(version=version.version if version else 0).all():
+        if param.city is None:
+            params[param.name] = param.value
+        else:
+            overrides.setdefault(param.city, {})[param.name] = param.value
+    return {
+        'version': version.version if version else 0,
+        'note': version.note if version else 'Built-in defaults',
+        'created_at': version.created_at.isoformat() if version and version.created_at else None,
+        'params': params,
+        'overrides': overrides,
+        'defaults': DEFAULT_COST_MODEL
+    }
+
+def _cost_value(name, value):
+    """Validate one cost-model parameter; returns the float value"""
+    if name not in DEFAULT_COST_MODEL:
+        raise ValueError(f"Unknown cost model parameter '{name}'")
+    value = float(value)
+    if value < 0 or (name.endswith('_unit') and value == 0):
+        raise ValueError(f"Invalid value for '{name}'")
+    return value
+
+@admin_bp.route('/cost-model', methods=['GET'])
+@admin_required
+def get_cost_model():
+    """Get the active cost model (or ?version=N) and the list of versions"""
+    try:
+        version_id = request.args.get('version', type=int)
+        if version_id is not None:
+            version = CostModelVersion.query.get(version_id)
+            if not version and version_id != 0:
+                return jsonify({'success': False, 'error': 'Cost model version not found'}), 404
+        else:
+            version = CostModelVersion.query.order_by(CostModelVersion.version.desc()).first()
+        
+        versions = CostModelVersion.query.order_by(CostModelVersion.version.desc()).all()
+        return jsonify({
+            'success': True,
+            'cost_model': cost_model_dict(version),
+            'versions': [v.to_dict() for v in versions]
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/cost-model', methods=['PUT'])
+@admin_required
+def update_cost_model():
+    """Publish a new cost model version from the active one plus the given changes
+    
+    Body: {"params": {name: value}, "overrides": {city: {name: value}}, "note": "..."}.
+    A null value resets a parameter (or drops a city override); "reset": true
+    starts from the built-in defaults instead of the active version.
+    """
+    try:
+        data = request.get_json() or {}
+        current = CostModelVersion.query.order_by(CostModelVersion.version.desc()).first()
+        
+        # (city, name) -> value, starting from the active version
+        values = {}
+        if current and not data.get('reset'):
+            for param in CostModelParam.query.filter_by(version=current.version).all():
+                values[(param.city, param.name)] = param.value
+        
+        changes = [(None, name, value) for name, value in (data.get('params') or {}).items()]
+        overrides = data.get('overrides') or {}
+        if overrides:
+            known = {name for (name,) in db.session.query(City.name).filter(City.name.in_(list(overrides)))}
+            unknown = sorted(set(overrides) - known)
+            if unknown:
+                return jsonify({'success': False, 'error': f'Unknown cities: {", ".join(unknown)}'}), 400
+            for city, params in overrides.items():
+                if params is None:
+                    values = {key: v for key, v in values.items() if key[0] != city}
+                    continue
+                changes.extend((city, name, value) for name, value in params.items())
+        
+        try:
+            for city, name, value in changes:
+                if value is None:
+                    _cost_value(name, DEFAULT_COST_MODEL.get(name, 0))
+                    values.pop((city, name), None)
+                else:
+                    values[(city, name)] = _cost_value(name, value)
+        except (ValueError, TypeError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        user_id = int(get_jwt_identity())
+        version = CostModelVersion(
+            version=(current.version if current else 0) + 1,
+            note=data.get('note'),
+            created_by=user_id
+        )
+        db.session.add(version)
+        db.session.add_all(
+            CostModelParam(version=version.version, city=city, name=name, value=value)
+            for (city, name), value in values.items()
+        )
+        db.session.commit()
+        refresh_rates()
+        
+        return jsonify({
+            'success': True,
+            'message': f'Cost model version {version.version} is now active',
+            'cost_model': cost_model_dict(version)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ========== BULK REPRICING ==========
+@admin_bp.route('/reprice', methods=['POST'])
+@admin_required
+def start_reprice():
+    """Start a background job that reprices saved estimates with current rates
+    
+    Optional body: location, quality, start/end (YYYY-MM-DD) and chunk_size.
+    """
+    try:
+        from app import reprice
+        
+        data = request.get_json(silent=True) or {}
+        filters = {key: data[key] for key in ('location', 'quality', 'start', 'end') if data.get(key)}
+        try:
+            export_filters(filters)
+            chunk_size = int(data.get('chunk_size', current_app.config.get('REPRICE_CHUNK_ROWS', 500)))
+            if not 1 <= chunk_size <= 10000:
+                raise ValueError
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'start/end must be YYYY-MM-DD and chunk_size between 1 and 10000'
+            }), 400
+        
+        job = reprice.create_job(filters, chunk_size, user_id=int(get_jwt_identity()))
+        if not reprice.claim(job.id):
+            db.session.refresh(job)
+            return jsonify({'success': False, 'error': f'Job is {job.status}', 'job': job.to_dict()}), 409
+        reprice.start_job(current_app._get_current_object(), job.id)
+        
+        return jsonify({
+            'success': True,
+            'message': f'Repricing {job.total} estimates',
+            'job': job.to_dict()
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/reprice', methods=['GET'])
+@admin_required
+def list_reprice_jobs():
+    """Recent repricing jobs, newest first"""
+    try:
+        jobs = RepriceJob.query.order_by(RepriceJob.id.desc()).limit(20).all()
+        return jsonify({'success': True, 'jobs': [job.to_dict() for job in jobs]}), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/reprice/<int:job_id>', methods=['GET'])
+@admin_required
+def get_reprice_job(job_id):
+    """Progress, throughput and checkpoint of a repricing job"""
+    try:
+        job = RepriceJob.query.get(job_id)
+        if not job:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        return jsonify({'success': True, 'job': job.to_dict()}), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/reprice/<int:job_id>/pause', methods=['POST'])
+@admin_required
+def pause_reprice_job(job_id):
+    """Stop a running job after its current chunk"""
+    try:
+        job = RepriceJob.query.get(job_id)
+        if not job:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        if job.status not in ('pending', 'running'):
+            return jsonify({'success': False, 'error': f'Job is {job.status}'}), 409
+        job.status = 'paused'
+        db.session.commit()
+        return jsonify({'success': True, 'job': job.to_dict()}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/reprice/<int:job_id>/resume', methods=['POST'])
+@admin_required
+def resume_reprice_job(job_id):
+    """Continue a paused, failed or abandoned job from its checkpoint"""
+    try:
+        from app import reprice
+        
+        job = RepriceJob.query.get(job_id)
+        if not job:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        if not reprice.claim(job_id):
+            return jsonify({'success': False, 'error': f'Job is {job.status}'}), 409
+        reprice.start_job(current_app._get_current_object(), job_id)
+        
+        db.session.refresh(job)
+        return jsonify({'success': True, 'job': job.to_dict()}), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ========== ESTIMATES MANAGEMENT ==========
 @admin_bp.route('/estimates', methods=['GET'])
 @admin_required
@@ -316,20 +565,42 @@ def get_all_estimates():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
-        # Query with pagination
-        query = Estimate.query.order_by(Estimate.created_at.desc())
-        total = query.count()
+        if wants_cursor(request.args):
+            # Keyset pagination: no OFFSET scan, total only on request
+            try:
+                result = keyset_page(
+                    estimate_with_user_query(),
+                    Estimate,
+                    cursor=request.args.get('cursor'),
+                    limit=per_page,
+                    include_total=wants_total(request.args)
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            estimates = result['items']
+        else:
+            # Query with pagination
+            total = Estimate.query.count()
+            
+            # Apply pagination
+            estimates = estimate_with_user_query()\
+                .order_by(Estimate.created_at.desc())\
+                .offset((page - 1) * per_page)\
+                .limit(per_page)\
+                .all()
         
-        # Apply pagination
-        estimates = query.offset((page - 1) * per_page).limit(per_page).all()
+        # Users come from the same joined query
+        estimates_data = [estimate_with_user_row_to_dict(row) for row in estimates]
         
-        # Get user info for each estimate
-        estimates_data = []
-        for estimate in estimates:
-            user = User.query.get(estimate.user_id)
-            estimate_data = estimate.to_dict()
-            estimate_data['user'] = user.to_dict() if user else None
-            estimates_data.append(estimate_data)
+        if wants_cursor(request.args):
+            return jsonify({
+                'success': True,
+                'estimates': estimates_data,
+                'next_cursor': result['next_cursor'],
+                'prev_cursor': result['prev_cursor'],
+                'total': result['total'],
+                'per_page': per_page
+            }), 200
         
         return jsonify({
             'success': True,
@@ -344,22 +615,38 @@ def get_all_estimates():
         print(f"Get estimates error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@admin_bp.route('/estimates/export', methods=['GET'])
+@admin_required
+def export_estimates():
+    """Stream all estimates as CSV or NDJSON"""
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': 'format must be csv or ndjson'}), 400
+        try:
+            filters = export_filters(request.args)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'start and end must be YYYY-MM-DD'}), 400
+        
+        return export_response(filters, fmt, 'estimates', include_user=True)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @admin_bp.route('/estimates/<int:estimate_id>', methods=['GET'])
 @admin_required
 def get_estimate_details(estimate_id):
     """Get specific estimate details"""
     try:
-        estimate = Estimate.query.get(estimate_id)
-        if not estimate:
+        row = estimate_with_user_query().filter(Estimate.id == estimate_id).first()
+        if not row:
+            await_flush()
+            row = estimate_with_user_query().filter(Estimate.id == estimate_id).first()
+        if not row:
             return jsonify({'success': False, 'error': 'Estimate not found'}), 404
-        
-        user = User.query.get(estimate.user_id)
-        estimate_data = estimate.to_dict()
-        estimate_data['user'] = user.to_dict() if user else None
             
         return jsonify({
             'success': True,
-            'estimate': estimate_data
+            'estimate': estimate_with_user_row_to_dict(row)
         }), 200
         
     except Exception as e:
@@ -371,10 +658,16 @@ def delete_estimate_admin(estimate_id):
     """Delete estimate (admin)"""
     try:
         estimate = Estimate.query.get(estimate_id)
+        if not estimate:
+            await_flush()
+            estimate = Estimate.query.get(estimate_id)
         if not estimate:
             return jsonify({'success': False, 'error': 'Estimate not found'}), 404
         
+        # Cost graphs go too (SQLite does not enforce the ON DELETE CASCADE)
+        EstimateGraph.query.filter_by(estimate_id=estimate_id).delete()
         db.session.delete(estimate)
+        record_estimates(db.session, [estimate], sign=-1)
         db.session.commit()
         
         return jsonify({
@@ -396,20 +689,45 @@ def get_all_users():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
-        # Query with pagination
-        query = User.query.order_by(User.created_at.desc())
-        total = query.count()
-        
-        # Apply pagination
-        users = query.offset((page - 1) * per_page).limit(per_page).all()
+        if wants_cursor(request.args):
+            # Keyset pagination: no OFFSET scan, total only on request
+            try:
+                result = keyset_page(
+                    User.query,
+                    User,
+                    cursor=request.args.get('cursor'),
+                    limit=per_page,
+                    include_total=wants_total(request.args)
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            users = result['items']
+        else:
+            # Query with pagination
+            query = User.query.order_by(User.created_at.desc())
+            total = query.count()
+            
+            # Apply pagination
+            users = query.offset((page - 1) * per_page).limit(per_page).all()
         
+        # Estimate counts for the whole page in one grouped query
+        counts = estimate_counts([user.id for user in users])
         users_data = []
         for user in users:
             user_data = user.to_dict()
-            # Add estimate count
-            user_data['estimate_count'] = Estimate.query.filter_by(user_id=user.id).count()
+            user_data['estimate_count'] = counts.get(user.id, 0)
             users_data.append(user_data)
         
+        if wants_cursor(request.args):
+            return jsonify({
+                'success': True,
+                'users': users_data,
+                'next_cursor': result['next_cursor'],
+                'prev_cursor': result['prev_cursor'],
+                'total': result['total'],
+                'per_page': per_page
+            }), 200
+        
         return jsonify({
             'success': True,
             'users': users_data,
@@ -433,7 +751,7 @@ def get_user(user_id):
         
         user_data = user.to_dict()
         # Add estimate count
-        user_data['estimate_count'] = Estimate.query.filter_by(user_id=user.id).count()
+        user_data['estimate_count'] = estimate_counts([user.id]).get(user.id, 0)
         
         return jsonify({
             'success': True,
@@ -466,7 +784,13 @@ def update_user(user_id):
         
         # Update fields
         if 'is_active' in data:
-            user.is_active = bool(data['is_active'])
+            is_active = bool(data['is_active'])
+            if is_active != bool(user.is_active):
+                bump(db.session, active_users=1 if is_active else -1)
+                if not is_active:
+                    # Sign the user out everywhere
+                    revoke_user(user.id)
+            user.is_active = is_active
         
         if 'role' in data and data['role'] in ['user', 'admin']:
             # Don't allow demoting the only admin
@@ -477,12 +801,17 @@ def update_user(user_id):
                         'success': False, 
                         'error': 'Cannot remove the only admin'
                     }), 400
+            if data['role'] != user.role and user.is_active:
+                # Reissue tokens with the new role claim; other processes
+                # drop their cached principal at their next blocklist sync
+                revoke_user(user.id)
             user.role = data['role']
         
         if 'name' in data:
             user.name = data['name']
         
         db.session.commit()
+        invalidate_principal(user.id)
         
         return jsonify({
             'success': True,
@@ -518,12 +847,22 @@ def delete_user(user_id):
         if user.role == 'admin':
             return jsonify({'success': False, 'error': 'Cannot delete admin users'}), 400
         
-        # Delete user's estimates first
+        # Delete user's estimates first, taking them out of the rollups
+        removed = db.session.query(
+            Estimate.created_at, Estimate.total_cost, Estimate.total_area,
+            Estimate.location, Estimate.material_quality, Estimate.num_floors
+        ).filter_by(user_id=user_id).all()
+        record_estimates(db.session, removed, sign=-1)
+        EstimateGraph.query.filter(EstimateGraph.estimate_id.in_(
+            db.session.query(Estimate.id).filter_by(user_id=user_id))).delete(synchronize_session=False)
         Estimate.query.filter_by(user_id=user_id).delete()
         
         # Delete the user
+        bump(db.session, users=-1, active_users=-1 if user.is_active else 0)
+        revoke_user(user.id)
         db.session.delete(user)
         db.session.commit()
+        invalidate_principal(user_id)
         
         return jsonify({
             'success': True,
@@ -540,19 +879,21 @@ def delete_user(user_id):
 def get_system_stats():
     """Get system statistics"""
     try:
-        # Basic counts
+        # Basic counts from the summary tables
+        now = datetime.utcnow()
+        counters = read_counters(db.session)
+        today_estimates, _ = read_day(db.session, now.date())
+        total_estimates = int(counters['estimates'])
         stats = {
-            'total_users': User.query.count(),
-            'active_users': User.query.filter_by(is_active=True).count(),
-            'total_estimates': Estimate.query.count(),
-            'today_estimates': Estimate.query.filter(
-                func.date(Estimate.created_at) == func.current_date()
-            ).count(),
-            'total_materials': Material.query.count(),
-            'total_cities': City.query.count(),
-            'total_cost': float(db.session.query(func.sum(Estimate.total_cost)).scalar() or 0),
-            'avg_cost': float(db.session.query(func.avg(Estimate.total_cost)).scalar() or 0),
-            'server_time': datetime.utcnow().isoformat()
+            'total_users': int(counters['users']),
+            'active_users': int(counters['active_users']),
+            'total_estimates': total_estimates,
+            'today_estimates': today_estimates,
+            'total_materials': int(counters['materials']),
+            'total_cities': int(counters['cities']),
+            'total_cost': float(counters['estimate_cost']),
+            'avg_cost': float(counters['estimate_cost'] / total_estimates) if total_estimates else 0.0,
+            'server_time': now.isoformat()
         }
         
         return jsonify({
@@ -563,6 +904,121 @@ def get_system_stats():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@admin_bp.route('/system/rate-limits', methods=['GET'])
+@admin_required
+def get_rate_limits():
+    """Rate limit budgets and allowed/limited counters of this worker"""
+    try:
+        from app import ratelimit
+        return jsonify({
+            'success': True,
+            'rate_limits': ratelimit.stats()
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ========== ANALYTICS ==========
+ANALYTICS_DIMENSIONS = ('location', 'material_quality', 'num_floors')
+
+def _bucket_start(day, interval):
+    """First day of the week (Monday) or month containing `day`"""
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+@admin_bp.route('/analytics/timeseries', methods=['GET'])
+@admin_required
+def get_analytics_timeseries():
+    """Estimate volume, total cost and cost per sqft over time"""
+    try:
+        interval = request.args.get('interval', 'day')
+        if interval not in ('day', 'week', 'month'):
+            return jsonify({'success': False, 'error': 'interval must be day, week or month'}), 400
+        
+        group_by = [d for d in request.args.get('group_by', '').split(',') if d]
+        invalid = [d for d in group_by if d not in ANALYTICS_DIMENSIONS]
+        if invalid:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown group_by: {", ".join(invalid)}'
+            }), 400
+        
+        try:
+            end = date.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow().date()
+            start = date.fromisoformat(request.args['start']) if 'start' in request.args else end - timedelta(days=29)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'start and end must be YYYY-MM-DD'}), 400
+        
+        # Pre-aggregated per day, so a year is at most a few thousand rows
+        dimensions = [getattr(EstimateRollup, d) for d in group_by]
+        query = db.session.query(
+            EstimateRollup.day,
+            *dimensions,
+            func.sum(EstimateRollup.estimate_count),
+            func.sum(EstimateRollup.total_cost),
+            func.sum(EstimateRollup.total_area)
+        ).filter(EstimateRollup.day >= start, EstimateRollup.day <= end)
+        
+        if request.args.get('location'):
+            query = query.filter(EstimateRollup.location == request.args['location'])
+        if request.args.get('material_quality'):
+            query = query.filter(EstimateRollup.material_quality == request.args['material_quality'].capitalize())
+        if request.args.get('num_floors'):
+            query = query.filter(EstimateRollup.num_floors == request.args.get('num_floors', type=int))
+        
+        buckets = {}
+        for row in query.group_by(EstimateRollup.day, *dimensions).all():
+            key = (_bucket_start(row[0], interval),) + tuple(row[1:1 + len(group_by)])
+            count, cost, area = row[1 + len(group_by):]
+            bucket = buckets.setdefault(key, [0, 0.0, 0.0])
+            bucket[0] += int(count or 0)
+            bucket[1] += float(cost or 0)
+            bucket[2] += float(area or 0)
+        
+        series = []
+        for key in sorted(buckets, key=lambda k: tuple('' if v is None else str(v) for v in k)):
+            count, cost, area = buckets[key]
+            point = {'bucket': key[0].isoformat()}
+            point.update(zip(group_by, key[1:]))
+            point.update({
+                'estimate_count': count,
+                'total_cost': round(cost),
+                'avg_cost': round(cost / count) if count else 0,
+                'cost_per_sqft': round(cost / area, 2) if area else 0
+            })
+            series.append(point)
+        
+        return jsonify({
+            'success': True,
+            'interval': interval,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'group_by': group_by,
+            'series': series
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@admin_bp.route('/system/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Get estimate result cache counters"""
+    try:
+        from app.estimate import get_result_cache
+        from app.rates import get_snapshot
+        
+        return jsonify({
+            'success': True,
+            'rate_version': get_snapshot().version,
+            'estimate_cache': get_result_cache().stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ========== TEST ENDPOINT ==========
 @admin_bp.route('/test', methods=['GET'])
 @admin_required
@@ -570,12 +1026,12 @@ def test_admin():
     """Test admin endpoint"""
     try:
         current_user_id = get_jwt_identity()
-        user = User.query.get(int(current_user_id))
+        user = get_principal(int(current_user_id))
         
         return jsonify({
             'success': True,
             'message': 'Admin API is working!',
-            'user': user.to_dict() if user else None,
+            'user': user,
             'is_admin': True
         }), 200
     except Exception as e:
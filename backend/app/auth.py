@@ -1,11 +1,25 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import decode_token, get_jwt
 from app import db
 from app.database import User
+from app.passwords import PasswordPoolBusy
+from app.principals import get_principal, token_claims
+from app.ratelimit import rate_limited
+from app.revocation import revoke_token
+from app.rollups import bump
 
 auth_bp = Blueprint('auth', __name__)
 
+@auth_bp.errorhandler(PasswordPoolBusy)
+def password_pool_busy(e):
+    response = jsonify({'error': 'Too many sign-in requests right now. Please try again shortly.'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 @auth_bp.route('/register', methods=['POST'])
+@rate_limited
 def register():
     data = request.get_json()
     
@@ -27,11 +41,13 @@ def register():
     
     try:
         db.session.add(user)
+        bump(db.session, users=1, active_users=1)
         db.session.commit()
         
         # Create tokens with SIMPLE user ID as identity
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
+        claims = token_claims(user.to_dict())
+        access_token = create_access_token(identity=str(user.id), additional_claims=claims)
+        refresh_token = create_refresh_token(identity=str(user.id), additional_claims=claims)
         
         return jsonify({
             'success': True,
@@ -46,6 +62,7 @@ def register():
         return jsonify({'error': f'Registration failed: {str(e)}'}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limited
 def login():
     data = request.get_json()
     
@@ -63,9 +80,19 @@ def login():
     if not user.is_active:
         return jsonify({'error': 'Account is deactivated. Please contact admin.'}), 403
     
+    # Upgrade the stored hash after a BCRYPT_LOG_ROUNDS change
+    if user.password_needs_rehash():
+        try:
+            user.set_password(data['password'])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Password rehash skipped for user {user.id}: {str(e)}")
+    
     # Create tokens with SIMPLE user ID as identity
-    access_token = create_access_token(identity=str(user.id))
-    refresh_token = create_refresh_token(identity=str(user.id))
+    claims = token_claims(user.to_dict())
+    access_token = create_access_token(identity=str(user.id), additional_claims=claims)
+    refresh_token = create_refresh_token(identity=str(user.id), additional_claims=claims)
     
     return jsonify({
         'success': True,
@@ -89,14 +116,14 @@ def profile():
         except (ValueError, TypeError):
             return jsonify({'error': 'Invalid token format'}), 401
         
-        user = User.query.get(user_id)
+        user = get_principal(user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
         return jsonify({
             'success': True,
-            'user': user.to_dict()
+            'user': user
         }), 200
     except Exception as e:
         print(f"Profile error: {e}")
@@ -115,12 +142,15 @@ def refresh():
         except (ValueError, TypeError):
             return jsonify({'error': 'Invalid token format'}), 401
         
-        user = User.query.get(user_id)
+        user = get_principal(user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        access_token = create_access_token(identity=str(user.id))
+        if not user['is_active']:
+            return jsonify({'error': 'Account is deactivated. Please contact admin.'}), 403
+        
+        access_token = create_access_token(identity=str(user['id']), additional_claims=token_claims(user))
         
         return jsonify({
             'success': True,
@@ -133,11 +163,27 @@ def refresh():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    # In a production app, you might want to add token to a blacklist
-    return jsonify({
-        'success': True,
-        'message': 'Logout successful'
-    }), 200
+    try:
+        # Revoke this access token, and the refresh token if the client sends it
+        revoke_token(get_jwt())
+        data = request.get_json(silent=True) or {}
+        if data.get('refresh_token'):
+            try:
+                refresh_payload = decode_token(data['refresh_token'])
+            except Exception:
+                refresh_payload = None
+            if refresh_payload and refresh_payload.get('sub') == get_jwt_identity():
+                revoke_token(refresh_payload)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Logout successful'
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Logout error: {e}")
+        return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/test', methods=['GET'])
 def test():
@@ -0,0 +1,272 @@
+"""
+Maintenance commands. Run from the backend folder:
+
+    python -m app.cli migrate          - Create/upgrade tables and seed initial data
+    python -m app.cli seed             - Add any missing initial data
+    python -m app.cli rebuild-stats    - Recompute the dashboard summary tables
+    python -m app.cli reprice          - Reprice saved estimates with current rates
+    python -m app.cli export-rates F   - Save the current rates to a snapshot file
+    python -m app.cli prune-idempotency-keys - Delete expired Idempotency-Key records
+    python -m app.cli estimate IN OUT  - Price a CSV/JSONL file of projects offline
+    python -m app.cli bench-passwords  - Measure password checks (logins) per second
+    python -m app.cli bench-revocation - Measure the revoked-token check with N revoked tokens
+"""
+import argparse
+import contextlib
+import os
+import sys
+
+
+def migrate(args):
+    from app import schema
+    from app.rates import refresh_rates
+
+    if not schema.migrate(seed=not args.no_seed):
+        return 1
+    # Let running workers pick up seeded rates
+    refresh_rates()
+
+
+def seed(args):
+    from app import db, rate_history, seed_initial_data
+
+    from app.rates import refresh_rates
+
+    seed_initial_data()
+    if rate_history.backfill(db.session):
+        db.session.commit()
+    refresh_rates()
+
+
+def rebuild_stats(args):
+    from app import db, rollups
+
+    counters = rollups.rebuild(db.session)
+    db.session.commit()
+    print("✅ Summary tables rebuilt")
+    for name, value in counters.items():
+        print(f"   {name}: {value}")
+
+
+def reprice_estimates(args):
+    from app import db, reprice
+    from app.database import RepriceJob
+
+    if args.resume:
+        job_id = args.resume
+    else:
+        filters = {key: value for key, value in
+                   (('location', args.location), ('quality', args.quality)) if value}
+        job_id = reprice.create_job(filters, args.chunk_size).id
+    if not reprice.claim(job_id):
+        print(f"❌ Job {job_id} is not resumable (finished, missing or running elsewhere)")
+        return 1
+
+    def progress(job):
+        print(f"   {job['processed']}/{job['total']} ({job['progress']}%), "
+              f"{job['updated']} updated, {job['skipped']} skipped, {job['rows_per_second']} rows/s", flush=True)
+
+    print(f"🔄 Repricing estimates (job {job_id})")
+    reprice.run_job(job_id, progress=progress)
+    job = db.session.get(RepriceJob, job_id)
+    print(f"{'✅' if job.status == 'completed' else '❌'} Job {job_id} {job.status}"
+          + (f": {job.error}" if job.error else ''))
+    return 0 if job.status == 'completed' else 1
+
+
+def export_rates(args):
+    from app.rates import get_rates
+    from app.shared_rates import write_snapshot
+
+    table = get_rates()
+    write_snapshot(args.path, table)
+    print(f"✅ Rates for {len(table.city_names)} cities written to {args.path}")
+
+
+def estimate(args):
+    from app import offline
+
+    if args.rates:
+        from app.shared_rates import read_snapshot
+        table = read_snapshot(args.rates)
+    else:
+        from app.rates import get_rates
+        table = get_rates()
+
+    in_fmt = offline.detect_format(args.input, args.input_format)
+    out_fmt = offline.detect_format(args.output, args.output_format)
+    source = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8')
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        rows, errors, seconds = offline.run(table, source, sink, in_fmt, out_fmt,
+                                            chunk_size=args.chunk_size, workers=args.workers)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    rate = rows / seconds if seconds > 0 else 0
+    print(f"✅ Priced {rows} rows in {seconds:.1f}s ({rate:,.0f} rows/s), {errors} with errors",
+          file=sys.stderr)
+
+
+def prune_idempotency_keys(args):
+    from datetime import datetime, timedelta
+
+    from flask import current_app
+
+    from app import db
+    from app.database import IdempotencyKey
+
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete()
+    db.session.commit()
+    print(f"✅ Deleted {deleted} expired idempotency keys")
+
+
+def bench_passwords(args):
+    import os
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from flask import current_app
+
+    from app import passwords
+
+    config = current_app.config
+    if args.rounds is not None:
+        config['BCRYPT_LOG_ROUNDS'] = args.rounds
+    if args.workers is not None:
+        config['PASSWORD_HASH_WORKERS'] = args.workers
+        config['PASSWORD_HASH_QUEUE'] = max(args.workers, 1) * 8
+    workers = config['PASSWORD_HASH_WORKERS']
+    password_hash = passwords.hash_password('benchmark-password')
+    app = current_app._get_current_object()
+
+    def login_loop(deadline):
+        count = 0
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                passwords.check_password(password_hash, 'benchmark-password')
+                count += 1
+        return count
+
+    # Enough request threads to keep every hashing process busy
+    threads = max(workers, 1) * 2
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        counts = list(executor.map(login_loop, [started + args.seconds] * threads))
+    seconds = time.perf_counter() - started
+    rate = sum(counts) / seconds
+    cores = min(max(workers, 1), os.cpu_count() or 1)
+    print(f"✅ {sum(counts)} password checks in {seconds:.1f}s at cost {config['BCRYPT_LOG_ROUNDS']}")
+    print(f"   {rate:,.1f} logins/s with {workers or 'no'} hashing processes, "
+          f"{rate / cores:,.1f} logins/s per core")
+
+
+def bench_revocation(args):
+    import random
+    import time
+    import uuid
+
+    from app.revocation import Blocklist, jti_key
+
+    def payloads(count):
+        return [{'jti': str(uuid.uuid4()), 'sub': str(random.randrange(1, 100000)), 'iat': int(time.time())}
+                for _ in range(count)]
+
+    checks = payloads(args.checks)
+    expires = int(time.time()) + 86400
+    print(f"🔄 Checking {args.checks} tokens against blocklists of up to {args.tokens} revoked tokens")
+    for size in sorted({0, min(1000, args.tokens), args.tokens}):
+        blocklist = Blocklist()
+        blocklist.tokens = {jti_key(str(uuid.uuid4())): expires for _ in range(size)}
+        for user_id in range(1, min(size, 10000) + 1):
+            blocklist.add_cutoff(user_id * 10, 0, expires)
+        # Half of the checked tokens are revoked ones
+        for payload in checks[::2]:
+            blocklist.add_token(jti_key(payload['jti']), expires)
+
+        started = time.perf_counter()
+        revoked = sum(1 for payload in checks if blocklist.is_revoked(payload))
+        seconds = time.perf_counter() - started
+        print(f"   {size:>10} revoked: {seconds / len(checks) * 1e6:.2f} µs per check ({revoked} revoked)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m app.cli',
+                                     description='Construction Cost Estimator maintenance commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('migrate', help='Create/upgrade tables and seed initial data')
+    command.add_argument('--no-seed', action='store_true', help='Skip the initial data')
+    command.set_defaults(func=migrate)
+
+    command = commands.add_parser('seed', help='Add any missing initial data')
+    command.set_defaults(func=seed)
+
+    command = commands.add_parser('rebuild-stats', help='Recompute dashboard summary tables')
+    command.set_defaults(func=rebuild_stats)
+
+    command = commands.add_parser('reprice', help='Reprice saved estimates with current rates')
+    command.add_argument('--location', help='Only estimates for this city')
+    command.add_argument('--quality', help='Only estimates of this material quality')
+    command.add_argument('--chunk-size', type=int, default=500, help='Rows per transaction')
+    command.add_argument('--resume', type=int, metavar='JOB_ID', help='Continue a job from its checkpoint')
+    command.set_defaults(func=reprice_estimates)
+
+    command = commands.add_parser('export-rates', help='Save the current rates to a snapshot file')
+    command.add_argument('path')
+    command.set_defaults(func=export_rates)
+
+    command = commands.add_parser('prune-idempotency-keys', help='Delete expired Idempotency-Key records')
+    command.set_defaults(func=prune_idempotency_keys)
+
+    command = commands.add_parser('estimate', help='Price a CSV/JSONL file of projects offline')
+    command.add_argument('input', help="Input file with /calculate fields per row ('-' for stdin)")
+    command.add_argument('output', help="Output file ('-' for stdout)")
+    command.add_argument('--rates', help='Rate snapshot file (from export-rates); skips the database')
+    command.add_argument('--input-format', choices=('csv', 'jsonl'))
+    command.add_argument('--output-format', choices=('csv', 'jsonl'))
+    command.add_argument('--chunk-size', type=int, default=5000, help='Rows per pricing chunk')
+    command.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    command.set_defaults(func=estimate)
+
+    command = commands.add_parser('bench-passwords', help='Measure password checks (logins) per second')
+    command.add_argument('--seconds', type=float, default=5.0)
+    command.add_argument('--rounds', type=int, help='bcrypt cost (default: BCRYPT_LOG_ROUNDS)')
+    command.add_argument('--workers', type=int, help='Hashing processes, 0 for inline (default: PASSWORD_HASH_WORKERS)')
+    command.set_defaults(func=bench_passwords)
+
+    command = commands.add_parser('bench-revocation', help='Measure the revoked-token check')
+    command.add_argument('--tokens', type=int, default=2000000, help='Revoked tokens in the blocklist')
+    command.add_argument('--checks', type=int, default=200000, help='Token checks to time')
+    command.set_defaults(func=bench_revocation)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if getattr(args, 'rates', None):
+        # A rate snapshot makes offline pricing independent of the database
+        return args.func(args) or 0
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    if args.command in ('migrate', 'seed'):
+        # The command itself does the work; skip the startup migration
+        os.environ['AUTO_MIGRATE'] = '0'
+
+    from app import create_app
+    # Keep startup messages off stdout, which `estimate` may be writing to
+    with contextlib.redirect_stdout(sys.stderr):
+        app = create_app()
+    with app.app_context():
+        return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Cost dependency graph for incremental re-estimation.
+
+The engine's calculation is modelled as a DAG of named nodes (labor, each
+material line, equipment, finishes, overhead, ceiling multiplier, total).
+Node values are stored per estimate on its first PATCH (seeded from the
+saved inputs, so /calculate never pays for the graph), and later edits
+only recompute the nodes downstream of the changed inputs.
+
+Rate lookup nodes read the current RateTable and are always re-read;
+everything else is recomputed only when one of its dependencies changed
+value. Computed nodes call the engine's cost steps (engine.compute_*), the
+same functions engine.price_inputs() applies to arrays, so a fully
+recomputed graph matches /calculate exactly.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from app import engine
+from app.engine import ACCURACY_LEVEL, BOQ_LINES, CEILING_MULTIPLIERS, MATERIAL_KEYS, finishes_column
+
+# Input nodes: the parsed project fields that affect the price
+INPUTS = ('area', 'floors', 'rooms', 'location', 'quality', 'ceiling_height',
+          'includes_finishes', 'finishes_quality')
+
+# fn is called with the values of `deps`, in order; `lookup` nodes read the
+# RateTable and get it as their first argument
+Node = namedtuple('Node', 'name deps fn lookup')
+
+
+def _material_nodes(j, key):
+    return [
+        Node(f'{key}_takeoff', ('city', 'quality_row'), lambda r, city, q: float(r.takeoff[city, q, j]), True),
+        Node(f'{key}_scale', ('city', 'quality_row'), lambda r, city, q: float(r.quality_scale[city, q, j]), True),
+        Node(f'{key}_unit', ('city', 'quality_row'), lambda r, city, q: float(r.units[city, q, j]), True),
+        Node(f'{key}_price', ('city', 'quality_row'), lambda r, city, q: float(r.prices[city, q, j]), True),
+        Node(f'{key}_rate', ('city', 'quality_row'), lambda r, city, q: float(r.unit_rates[city, q, j]), True),
+        Node(f'{key}_quantity', ('effective_area', f'{key}_takeoff', f'{key}_scale'),
+             engine.compute_quantity, False),
+        Node(f'{key}_cost', (f'{key}_quantity', f'{key}_unit', f'{key}_price'), engine.compute_material_line, False)
+    ]
+
+
+def _material_total(*costs):
+    return float(engine.compute_material(np.array(costs)))
+
+
+def _finishes_rate(r, city, column):
+    return float(r.finishes[city, column]) if column >= 0 else 0.0
+
+
+# Topological order
+NODES = (
+    [
+        Node('city', ('location',), lambda r, location: r.city_row(location), True),
+        Node('quality_row', ('quality',), lambda r, quality: r.quality_row(quality), True),
+        Node('finishes_column', ('finishes_quality', 'includes_finishes'), finishes_column, False),
+        Node('effective_area', ('area', 'floors'), engine.compute_effective_area, False),
+        Node('labor_rate', ('city',), lambda r, city: float(r.labor[city]), True),
+        Node('labor', ('area', 'labor_rate', 'floors'), engine.compute_labor, False)
+    ]
+    + [node for j, key in enumerate(MATERIAL_KEYS) for node in _material_nodes(j, key)]
+    + [
+        Node('material', tuple(f'{key}_cost' for key in MATERIAL_KEYS), _material_total, False),
+        Node('equipment_factor', ('city',), lambda r, city: float(r.equipment_factor[city]), True),
+        Node('equipment', ('labor', 'equipment_factor'), engine.compute_equipment, False),
+        Node('finishes_rate', ('city', 'finishes_column'), _finishes_rate, True),
+        Node('finishes', ('area', 'finishes_rate', 'floors'), engine.compute_finishes, False),
+        Node('room_cost', ('city',), lambda r, city: float(r.room_cost[city]), True),
+        Node('rooms_total', ('rooms', 'room_cost'), engine.compute_rooms, False),
+        Node('subtotal', ('material', 'labor', 'equipment', 'finishes'), engine.compute_subtotal, False),
+        Node('overhead_factor', ('city',), lambda r, city: float(r.overhead_factor[city]), True),
+        Node('overhead', ('subtotal', 'overhead_factor'), engine.compute_overhead, False),
+        Node('ceiling_multiplier', ('ceiling_height',),
+             lambda height: CEILING_MULTIPLIERS.get(height, 1.0), False),
+        Node('total', ('subtotal', 'overhead', 'ceiling_multiplier', 'rooms_total'), engine.compute_total, False),
+        Node('duration', ('area', 'floors'), lambda area, floors: int(engine.compute_duration(area, floors)), False)
+    ]
+)
+
+
+def project_values(project):
+    """Input node values of a parsed project"""
+    return {name: project[name] for name in INPUTS}
+
+
+def evaluate(project, rates, memo=None):
+    """Compute every node value for `project`
+
+    With `memo` (the stored values of an earlier evaluation) only lookup
+    nodes and nodes downstream of a changed value are recomputed. Returns
+    (values, names of the recomputed non-input nodes).
+    """
+    values = dict(memo or {})
+    changed = set()
+    for name in INPUTS:
+        if memo is None or values.get(name) != project[name]:
+            values[name] = project[name]
+            changed.add(name)
+
+    recomputed = []
+    for node in NODES:
+        if memo is not None and node.name in values and not node.lookup \
+                and changed.isdisjoint(node.deps):
+            continue
+        args = [values[dep] for dep in node.deps]
+        value = node.fn(rates, *args) if node.lookup else node.fn(*args)
+        if node.lookup and memo is not None and values.get(node.name) == value:
+            continue
+        recomputed.append(node.name)
+        if memo is None or values.get(node.name) != value:
+            changed.add(node.name)
+        values[node.name] = value
+    return values, recomputed
+
+
+def estimate_payload(values):
+    """The /calculate `estimate` payload for evaluated node values"""
+    return {
+        'material_cost': round(values['material']),
+        'labor_cost': round(values['labor']),
+        'equipment_cost': round(values['equipment']),
+        'finishes_cost': round(values['finishes']),
+        'other_costs': round(values['overhead']),
+        'total_cost': round(values['total']),
+        'estimated_duration_days': values['duration'],
+        'material_boq': [
+            {'material': label, 'unit': unit,
+             'quantity': round(values[f'{key}_quantity']),
+             'rate': round(values[f'{key}_rate']),
+             'total': round(values[f'{key}_cost'])}
+            for key, (label, unit) in zip(MATERIAL_KEYS, BOQ_LINES)
+        ],
+        'accuracy_level': ACCURACY_LEVEL
+    }
@@ -1,8 +1,13 @@
 from app import db
 from datetime import datetime
+import json
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Keyset pagination order
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -22,12 +27,18 @@ class User(db.Model):
         self.is_active = True
     
     def set_password(self, password):
-        from app import bcrypt
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        # Hashed in app.passwords' process pool; may raise PasswordPoolBusy
+        from app import passwords
+        self.password_hash = passwords.hash_password(password)
     
     def check_password(self, password):
-        from app import bcrypt
-        return bcrypt.check_password_hash(self.password_hash, password)
+        from app import passwords
+        return passwords.check_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """True when the stored hash uses a different BCRYPT_LOG_ROUNDS"""
+        from app import passwords
+        return passwords.needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -84,8 +95,44 @@ class Material(db.Model):
             'luxury_rate': float(self.luxury_rate)
         }
 
+# ========== RATE HISTORY ==========
+# Append-only copies of every material and city rate change (app.rate_history)
+
+class MaterialRateHistory(db.Model):
+    __tablename__ = 'material_rate_history'
+    __table_args__ = (
+        db.Index('ix_material_rate_history_material_valid_from', 'material_id', 'valid_from'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    material_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    standard_rate = db.Column(db.Float, default=0)
+    premium_rate = db.Column(db.Float, default=0)
+    luxury_rate = db.Column(db.Float, default=0)
+    removed = db.Column(db.Boolean, nullable=False, default=False)
+    valid_from = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class CityRateHistory(db.Model):
+    __tablename__ = 'city_rate_history'
+    __table_args__ = (
+        db.Index('ix_city_rate_history_city_valid_from', 'city_id', 'valid_from'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    city_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    labor_rate_per_sqft = db.Column(db.Float, default=0)
+    removed = db.Column(db.Boolean, nullable=False, default=False)
+    valid_from = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
 class Estimate(db.Model):
     __tablename__ = 'estimates'
+    __table_args__ = (
+        # Keyset pagination order for admin listings and per-user history
+        db.Index('ix_estimates_created_at_id', 'created_at', 'id'),
+        db.Index('ix_estimates_user_created_at_id', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -130,4 +177,203 @@ class Estimate(db.Model):
             'total_cost': float(self.total_cost),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'user_id': self.user_id
-        }
\ No newline at end of file
+        }
+
+class EstimateGraph(db.Model):
+    __tablename__ = 'estimate_graphs'
+    
+    # Memoized app.costgraph node values (JSON) for incremental edits
+    estimate_id = db.Column(db.Integer, db.ForeignKey('estimates.id', ondelete='CASCADE'), primary_key=True)
+    node_values = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CostModelVersion(db.Model):
+    __tablename__ = 'cost_model_versions'
+    
+    # The highest version is the active cost model
+    version = db.Column(db.Integer, primary_key=True)
+    note = db.Column(db.String(200))
+    created_by = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'note': self.note,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class CostModelParam(db.Model):
+    __tablename__ = 'cost_model_params'
+    __table_args__ = (
+        db.Index('ix_cost_model_params_version_city', 'version', 'city'),
+    )
+    
+    # Parameters a version changes from engine.DEFAULT_COST_MODEL; city is
+    # NULL for values that apply to every city
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, db.ForeignKey('cost_model_versions.version'), nullable=False)
+    city = db.Column(db.String(100))
+    name = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.Float, nullable=False)
+
+class RepriceJob(db.Model):
+    __tablename__ = 'reprice_jobs'
+    
+    # Bulk repricing of saved estimates (app.reprice); last_id is the
+    # resumable checkpoint, estimates up to max_id are in scope
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    filters = db.Column(db.Text)
+    chunk_size = db.Column(db.Integer, nullable=False, default=500)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    max_id = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    elapsed_ms = db.Column(db.Float, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_by = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        seconds = (self.elapsed_ms or 0) / 1000
+        remaining = max((self.total or 0) - (self.processed or 0), 0)
+        rate = self.processed / seconds if seconds > 0 else None
+        return {
+            'id': self.id,
+            'status': self.status,
+            'filters': json.loads(self.filters) if self.filters else {},
+            'chunk_size': self.chunk_size,
+            'checkpoint': self.last_id,
+            'max_id': self.max_id,
+            'total': self.total,
+            'processed': self.processed,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'progress': round(100.0 * self.processed / self.total, 1) if self.total else 100.0,
+            'rows_per_second': round(rate) if rate else None,
+            'eta_seconds': round(remaining / rate, 1) if rate else None,
+            'error': self.error,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+    
+    # One row per applied version (see app.schema)
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+    )
+    
+    # Claimed by app.idempotency; response stays NULL while the request runs
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)
+    response = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    
+    # See app.revocation: jti_key revokes one token; a row without it revokes
+    # every token of user_id issued up to revoked_at
+    id = db.Column(db.Integer, primary_key=True)
+    jti_key = db.Column(db.BigInteger, unique=True)
+    user_id = db.Column(db.Integer)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class IdBlock(db.Model):
+    __tablename__ = 'id_blocks'
+    
+    # Next free id per table, handed out to workers in blocks
+    name = db.Column(db.String(50), primary_key=True)
+    next_id = db.Column(db.BigInteger, nullable=False)
+
+# ========== ROLLUP TABLES ==========
+# Maintained incrementally by app.rollups; rebuild with `python -m app.cli rebuild-stats`
+
+class StatCounter(db.Model):
+    __tablename__ = 'stat_counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+class EstimateRollup(db.Model):
+    __tablename__ = 'estimate_rollups'
+    
+    # One row per day and analytics dimension combination
+    day = db.Column(db.Date, primary_key=True)
+    location = db.Column(db.String(100), primary_key=True)
+    material_quality = db.Column(db.String(20), primary_key=True)
+    num_floors = db.Column(db.Integer, primary_key=True)
+    estimate_count = db.Column(db.Integer, nullable=False, default=0)
+    total_cost = db.Column(db.Float, nullable=False, default=0)
+    total_area = db.Column(db.Float, nullable=False, default=0)
+
+# ========== SLIM ROW SERIALIZERS ==========
+# Column-only selects for listings; these mirror Estimate.to_dict() and
+# User.to_dict() without loading full ORM instances
+
+def estimate_with_user_query():
+    """Estimates joined to their user in a single SELECT of plain columns"""
+    return db.session.query(
+        *Estimate.__table__.columns,
+        User.id.label('estimator_id'),
+        User.name.label('estimator_name'),
+        User.email.label('estimator_email'),
+        User.role.label('estimator_role'),
+        User.is_active.label('estimator_is_active'),
+        User.created_at.label('estimator_created_at')
+    ).select_from(Estimate).outerjoin(User, User.id == Estimate.user_id)
+
+def estimate_row_to_dict(row):
+    return {
+        'id': row.id,
+        'project_name': row.project_name,
+        'total_area': float(row.total_area),
+        'location': row.location,
+        'num_rooms': row.num_rooms,
+        'room_length': float(row.room_length) if row.room_length else 0,
+        'room_width': float(row.room_width) if row.room_width else 0,
+        'ceiling_height': row.ceiling_height,
+        'material_quality': row.material_quality,
+        'includes_finishes': row.includes_finishes,
+        'finishes_quality': row.finishes_quality,
+        'num_floors': row.num_floors,
+        'material_cost': float(row.material_cost),
+        'labor_cost': float(row.labor_cost),
+        'equipment_cost': float(row.equipment_cost),
+        'finishes_cost': float(row.finishes_cost),
+        'other_costs': float(row.other_costs),
+        'total_cost': float(row.total_cost),
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'user_id': row.user_id
+    }
+
+def estimate_with_user_row_to_dict(row):
+    data = estimate_row_to_dict(row)
+    data['user'] = {
+        'id': row.estimator_id,
+        'name': row.estimator_name,
+        'email': row.estimator_email,
+        'role': row.estimator_role,
+        'is_active': row.estimator_is_active,
+        'created_at': row.estimator_created_at.isoformat() if row.estimator_created_at else None
+    } if row.estimator_id is not None else None
+    return data
@@ -0,0 +1,474 @@
+"""
+Vectorized cost engine.
+
+Prices any number of projects in one NumPy pass. The single /calculate
+endpoint is simply a batch of one, so both paths return identical numbers.
+
+The take-off coefficients, unit divisors, finishes rates and cost factors
+form a cost model that admins can override globally or per city. A
+RateTable lays it out with the rates as dense per (city, quality)
+matrices once per load, so pricing a project is a few products of its
+effective area with one row of those matrices. The matrices hold the
+factors as given, not their products: every material line is computed as
+((effective area * take-off) * quality factor / unit) * rate, the same
+order of operations as the original take-off, so rounded results never
+shift by a unit.
+"""
+import numpy as np
+
+QUALITY_FACTORS = {
+    'standard': 1.0,
+    'premium': 1.10,
+    'luxury': 1.20
+}
+
+CEILING_MULTIPLIERS = {'10': 1.0, '12': 1.12, '14': 1.25}
+
+# Cost columns priced for every project, in Estimate column order
+COST_COMPONENTS = ('material_cost', 'labor_cost', 'equipment_cost', 'finishes_cost', 'other_costs', 'total_cost')
+
+# Order of the material columns in every rate matrix
+MATERIAL_NAMES = ('cement', 'steel bars', 'bricks', 'sand', 'crush')
+
+# Cement and steel take-off grows with the quality factor; the rest does not
+QUALITY_SCALED = (True, True, False, False, False)
+
+FINISHES_QUALITIES = ('standard', 'premium', 'luxury')
+
+# Built-in cost model. Admins can override any parameter globally or per
+# city through the cost_model_params table (see RateTable.from_db)
+DEFAULT_COST_MODEL = {
+    # Take-off per sqft of covered area: cement bags, steel kg, bricks, sand cft, crush cft
+    'cement_per_sqft': 0.40,
+    'steel_per_sqft': 3.50,
+    'bricks_per_sqft': 8,
+    'sand_per_sqft': 1.20,
+    'crush_per_sqft': 0.90,
+    # Quantity a stored rate is quoted for (bricks per 1000 pcs, sand and crush per ~1000 cft truck)
+    'cement_unit': 1,
+    'steel_unit': 1,
+    'bricks_unit': 1000,
+    'sand_unit': 1000,
+    'crush_unit': 1000,
+    # Finishes rate per sqft of each floor
+    'finishes_standard': 450,
+    'finishes_premium': 750,
+    'finishes_luxury': 1300,
+    'room_cost': 60000,
+    'equipment_factor': 0.18,
+    'overhead_factor': 0.12
+}
+
+# Column order of compiled cost-model matrices
+COST_PARAMS = tuple(DEFAULT_COST_MODEL)
+
+# Short MATERIAL_NAMES keys used in cost-model parameter and graph node names
+MATERIAL_KEYS = ('cement', 'steel', 'bricks', 'sand', 'crush')
+_TAKEOFF_COLUMNS = [COST_PARAMS.index(f'{key}_per_sqft') for key in MATERIAL_KEYS]
+_UNIT_COLUMNS = [COST_PARAMS.index(f'{key}_unit') for key in MATERIAL_KEYS]
+_FINISHES_COLUMNS = [COST_PARAMS.index(f'finishes_{quality}') for quality in FINISHES_QUALITIES]
+
+
+def parse_project(data):
+    """Normalize one raw request payload into engine inputs"""
+    project = {
+        'area': float(data.get('projectSize', 0)),
+        'location': data.get('location', 'Karachi'),
+        'quality': data.get('materialQuality', 'standard').lower(),
+        'floors': int(data.get('floors', 1)),
+        'rooms': int(data.get('rooms', 0)),
+        'ceiling_height': data.get('ceilingHeight', '10'),
+        'includes_finishes': data.get('finishes', 'No') == 'Yes',
+        'finishes_quality': data.get('finishesQuality', 'standard').lower(),
+        'project_name': data.get('projectName', 'Untitled Project')
+    }
+    return project
+
+
+def estimate_request(estimate):
+    """A saved estimate row as the /calculate request payload that produced it
+
+    NULL columns are left out, so parse_project() applies the same defaults
+    as /calculate does for a missing field.
+    """
+    request = {
+        'projectSize': estimate.total_area,
+        'location': estimate.location,
+        'materialQuality': estimate.material_quality,
+        'floors': estimate.num_floors,
+        'rooms': estimate.num_rooms,
+        'ceilingHeight': estimate.ceiling_height,
+        'finishes': 'Yes' if estimate.includes_finishes else 'No',
+        'finishesQuality': estimate.finishes_quality,
+        'projectName': estimate.project_name
+    }
+    return {key: value for key, value in request.items() if value is not None}
+
+
+def pricing_key(project):
+    """Canonical key of the inputs that affect the price of a project"""
+    return (
+        project['area'],
+        project['location'],
+        project['quality'],
+        project['floors'],
+        project['rooms'],
+        project['ceiling_height'],
+        project['includes_finishes'],
+        project['finishes_quality'] if project['includes_finishes'] else None
+    )
+
+
+class RateTable:
+    """Labor and material rates plus the compiled cost model for every city"""
+    __slots__ = ('city_names', 'city_index', 'labor', 'qualities', 'quality_index', 'material',
+                 'model', 'model_version', 'takeoff', 'quality_scale', 'units', 'prices',
+                 'unit_rates', 'finishes',
+                 'room_cost', 'equipment_factor', 'overhead_factor')
+
+    def __init__(self, city_names, labor, material, qualities=tuple(QUALITY_FACTORS), model=None,
+                 model_version=0):
+        # labor[i] is the labor rate per sqft of city_names[i]
+        self.city_names = tuple(city_names)
+        self.city_index = {name: i for i, name in enumerate(self.city_names)}
+        n_cities = len(self.city_names)
+        self.labor = np.asarray(labor, dtype=np.float64).reshape(n_cities)
+        # material[q] holds the MATERIAL_NAMES rates of qualities[q]; the
+        # extra trailing zero row prices unknown quality grades
+        self.qualities = tuple(qualities)
+        self.quality_index = {name: i for i, name in enumerate(self.qualities)}
+        material = np.asarray(material, dtype=np.float64).reshape(len(self.qualities), len(MATERIAL_NAMES))
+        self.material = np.vstack([material, np.zeros((1, len(MATERIAL_NAMES)))])
+
+        # model[i] holds the COST_PARAMS values in effect for city i
+        if model is None:
+            model = np.tile([DEFAULT_COST_MODEL[name] for name in COST_PARAMS], (n_cities, 1))
+        self.model = np.asarray(model, dtype=np.float64).reshape(n_cities, len(COST_PARAMS))
+        self.model_version = model_version
+        self._compile()
+
+    def _compile(self):
+        """Lay the cost model and rates out as dense (city, quality, material) matrices
+
+        Factors are kept separate (see the module docstring); only the BOQ
+        display rate, which is not used in any total, is a precomputed ratio.
+        """
+        qf = np.array([QUALITY_FACTORS.get(q, 1.0) for q in self.qualities] + [1.0])
+        shape = (len(self.city_names), len(qf), len(MATERIAL_NAMES))
+        # Take-off per sqft, quality factor (1.0 for unscaled lines), the
+        # quantity a rate is quoted for, and the rate itself
+        self.takeoff = np.broadcast_to(self.model[:, None, _TAKEOFF_COLUMNS], shape)
+        self.quality_scale = np.broadcast_to(np.where(QUALITY_SCALED, qf[:, None], 1.0)[None], shape)
+        self.units = np.broadcast_to(self.model[:, None, _UNIT_COLUMNS], shape)
+        self.prices = np.broadcast_to(self.material[None], shape)
+        self.unit_rates = self.prices / self.units
+        # finishes[i, f] is city i's rate for FINISHES_QUALITIES[f]; the
+        # trailing column prices unknown grades at the standard rate
+        finishes = self.model[:, _FINISHES_COLUMNS]
+        self.finishes = np.hstack([finishes, finishes[:, :1]])
+        self.room_cost = self.model[:, COST_PARAMS.index('room_cost')]
+        self.equipment_factor = self.model[:, COST_PARAMS.index('equipment_factor')]
+        self.overhead_factor = self.model[:, COST_PARAMS.index('overhead_factor')]
+
+    @classmethod
+    def from_rows(cls, cities, materials, model=None, model_version=0):
+        """Build from City- and Material-like rows (ORM objects or rate history)"""
+        material_dict = {m.name.lower(): m for m in materials}
+        material = [
+            [getattr(material_dict.get(name), f"{quality}_rate", 0) or 0 for name in MATERIAL_NAMES]
+            for quality in QUALITY_FACTORS
+        ]
+        return cls([c.name for c in cities], [c.labor_rate_per_sqft or 0 for c in cities], material,
+                   model=model, model_version=model_version)
+
+    @classmethod
+    def from_db(cls):
+        """Load every city, material and the active cost model with one query each"""
+        from app.database import City, Material, CostModelParam, CostModelVersion
+        from app import db
+
+        cities = City.query.all()
+        version = db.session.query(db.func.max(CostModelVersion.version)).scalar() or 0
+        params = CostModelParam.query.filter_by(version=version).all() if version else []
+        return cls.from_rows(cities, Material.query.all(),
+                             model=compile_model([c.name for c in cities], params), model_version=version)
+
+    def city_row(self, location):
+        """Index of a city's rates, falling back to Karachi like the UI does"""
+        row = self.city_index.get(location)
+        if row is None:
+            row = self.city_index.get('Karachi')
+        if row is None:
+            raise LookupError(f"No rates for '{location}' and no Karachi fallback")
+        return row
+
+    def quality_row(self, quality):
+        return self.quality_index.get(quality, len(self.qualities))
+
+
+def finishes_column(quality, includes_finishes=True):
+    """Column of RateTable.finishes for a finishes grade (-1 when there are no finishes)"""
+    if not includes_finishes:
+        return -1
+    return FINISHES_QUALITIES.index(quality) if quality in FINISHES_QUALITIES else len(FINISHES_QUALITIES)
+
+
+def compile_model(city_names, params):
+    """Per-city COST_PARAMS matrix from defaults, global rows and city overrides
+
+    `params` are objects with `city` (None for every city), `name` and
+    `value`; names outside COST_PARAMS are ignored.
+    """
+    model = np.tile([DEFAULT_COST_MODEL[name] for name in COST_PARAMS], (len(city_names), 1))
+    city_index = {name: i for i, name in enumerate(city_names)}
+    columns = {name: j for j, name in enumerate(COST_PARAMS)}
+    # Global rows first so a city override always wins
+    for param in sorted(params, key=lambda p: p.city is not None):
+        j = columns.get(param.name)
+        if j is None:
+            continue
+        if param.city is None:
+            model[:, j] = param.value
+        elif param.city in city_index:
+            model[city_index[param.city], j] = param.value
+    return model
+
+
+def project_inputs(projects, rates):
+    """Gather the engine input columns for a list of parsed projects"""
+    n = len(projects)
+    city_rows = np.fromiter((rates.city_row(p['location']) for p in projects), dtype=np.intp, count=n)
+    quality_rows = np.fromiter((rates.quality_row(p['quality']) for p in projects), dtype=np.intp, count=n)
+    finishes_columns = np.fromiter(
+        (finishes_column(p['finishes_quality'], p['includes_finishes']) for p in projects),
+        dtype=np.intp, count=n)
+    return {
+        'area': np.fromiter((p['area'] for p in projects), dtype=np.float64, count=n),
+        'floors': np.fromiter((p['floors'] for p in projects), dtype=np.float64, count=n),
+        'rooms': np.fromiter((p['rooms'] for p in projects), dtype=np.float64, count=n),
+        'labor_rate': rates.labor[city_rows],
+        'ceiling': np.fromiter((CEILING_MULTIPLIERS.get(p['ceiling_height'], 1.0) for p in projects),
+                               dtype=np.float64, count=n),
+        'finishes_rate': np.where(finishes_columns >= 0,
+                                  rates.finishes[city_rows, finishes_columns], 0.0),
+        'takeoff': rates.takeoff[city_rows, quality_rows],
+        'quality_scale': rates.quality_scale[city_rows, quality_rows],
+        'units': rates.units[city_rows, quality_rows],
+        'prices': rates.prices[city_rows, quality_rows],
+        'unit_rates': rates.unit_rates[city_rows, quality_rows],
+        'room_cost': rates.room_cost[city_rows],
+        'equipment_factor': rates.equipment_factor[city_rows],
+        'overhead_factor': rates.overhead_factor[city_rows]
+    }
+
+
+def price_projects(projects, rates):
+    """Price a list of parsed projects, returning a dict of result arrays"""
+    return price_inputs(project_inputs(projects, rates))
+
+
+# Cost steps. price_inputs() applies them to arrays and app.costgraph to the
+# scalar values of one estimate, so both always do the same arithmetic.
+
+def compute_labor(area, labor_rate, floors):
+    return area * labor_rate * floors
+
+
+def compute_effective_area(area, floors):
+    return area * floors
+
+
+def compute_quantity(effective_area, takeoff, quality_scale):
+    """Quantity of material lines"""
+    return effective_area * takeoff * quality_scale
+
+
+def compute_material_line(quantity, unit, price):
+    """Cost of material lines: quantity in quoted units times the rate"""
+    return quantity / unit * price
+
+
+def compute_material(material_totals):
+    """Sum of the material line costs (last axis), left to right"""
+    total = material_totals[..., 0]
+    for j in range(1, material_totals.shape[-1]):
+        total = total + material_totals[..., j]
+    return total
+
+
+def compute_equipment(labor, equipment_factor):
+    return labor * equipment_factor
+
+
+def compute_finishes(area, finishes_rate, floors):
+    return area * finishes_rate * floors
+
+
+def compute_rooms(rooms, room_cost):
+    return rooms * room_cost
+
+
+def compute_subtotal(material, labor, equipment, finishes):
+    return material + labor + equipment + finishes
+
+
+def compute_overhead(subtotal, overhead_factor):
+    return subtotal * overhead_factor
+
+
+def compute_total(subtotal, overhead, ceiling, rooms):
+    return (subtotal + overhead) * ceiling + rooms
+
+
+def compute_duration(area, floors):
+    return np.maximum(45, np.rint((area / 1000) * 45 * floors))
+
+
+def price_inputs(inputs):
+    """Apply the compiled cost model to input columns
+
+    Inputs may be any mutually broadcastable arrays (takeoff, quality_scale,
+    units, prices and unit_rates have a trailing MATERIAL_NAMES axis), so a grid of scenarios
+    or a batch of simulation samples can be priced without materializing
+    every combination up front.
+    """
+    area = inputs['area']
+    floors = inputs['floors']
+
+    # -------- LABOR --------
+    labor_cost = compute_labor(area, inputs['labor_rate'], floors)
+
+    # -------- MATERIALS: effective area times the compiled cost row --------
+    effective_area = np.expand_dims(compute_effective_area(area, floors), -1)
+    quantities = compute_quantity(effective_area, inputs['takeoff'], inputs['quality_scale'])
+    material_totals = compute_material_line(quantities, inputs['units'], inputs['prices'])
+    material_cost = compute_material(material_totals)
+
+    # -------- EQUIPMENT, FINISHES, OTHER --------
+    equipment_cost = compute_equipment(labor_cost, inputs['equipment_factor'])
+    finishes_cost = compute_finishes(area, inputs['finishes_rate'], floors)
+    room_cost = compute_rooms(inputs['rooms'], inputs['room_cost'])
+    sub_total = compute_subtotal(material_cost, labor_cost, equipment_cost, finishes_cost)
+    other_costs = compute_overhead(sub_total, inputs['overhead_factor'])
+
+    total_cost = compute_total(sub_total, other_costs, inputs['ceiling'], room_cost)
+
+    return {
+        'material_cost': material_cost,
+        'labor_cost': labor_cost,
+        'equipment_cost': equipment_cost,
+        'finishes_cost': finishes_cost,
+        'other_costs': other_costs,
+        'total_cost': total_cost,
+        'duration_days': compute_duration(area, floors),
+        'quantities': quantities,
+        'unit_rates': np.broadcast_to(inputs['unit_rates'], quantities.shape),
+        'material_totals': material_totals
+    }
+
+
+# Sweep grid axes, in dimension order: request key, project key, normalizer
+SWEEP_AXES = (
+    ('location', 'location', str),
+    ('materialQuality', 'quality', lambda v: str(v).lower()),
+    ('floors', 'floors', int),
+    ('ceilingHeight', 'ceiling_height', str),
+    ('finishesQuality', 'finishes_quality', lambda v: str(v).lower())
+)
+
+
+def sweep_inputs(base, axis_values, rates):
+    """Broadcastable engine inputs for the Cartesian grid of `axis_values`
+
+    `axis_values` holds one list per SWEEP_AXES entry; axis k varies along
+    dimension k of every priced array. Everything else comes from `base`.
+    """
+    ndim = len(SWEEP_AXES)
+
+    def along(k, values):
+        shape = [1] * ndim
+        shape[k] = len(values)
+        return np.asarray(values, dtype=np.float64).reshape(shape)
+
+    locations, qualities, floors, ceilings, finishes = axis_values
+    city_rows = [rates.city_row(loc) for loc in locations]
+    grid = np.ix_(city_rows, [rates.quality_row(q) for q in qualities])
+    material_shape = (len(locations), len(qualities), 1, 1, 1, len(MATERIAL_NAMES))
+    finishes_rate = rates.finishes[np.ix_(city_rows, [finishes_column(f) for f in finishes])]
+    if not base['includes_finishes']:
+        finishes_rate = np.zeros_like(finishes_rate)
+
+    def per_city(values):
+        return np.asarray(values, dtype=np.float64)[city_rows].reshape((len(locations),) + (1,) * (ndim - 1))
+
+    return {
+        'area': np.float64(base['area']),
+        'floors': along(2, floors),
+        'rooms': np.float64(base['rooms']),
+        'labor_rate': per_city(rates.labor),
+        'ceiling': along(3, [CEILING_MULTIPLIERS.get(c, 1.0) for c in ceilings]),
+        'finishes_rate': finishes_rate.reshape(len(locations), 1, 1, 1, len(finishes)),
+        'takeoff': rates.takeoff[grid].reshape(material_shape),
+        'quality_scale': rates.quality_scale[grid].reshape(material_shape),
+        'units': rates.units[grid].reshape(material_shape),
+        'prices': rates.prices[grid].reshape(material_shape),
+        'unit_rates': rates.unit_rates[grid].reshape(material_shape),
+        'room_cost': per_city(rates.room_cost),
+        'equipment_factor': per_city(rates.equipment_factor),
+        'overhead_factor': per_city(rates.overhead_factor)
+    }
+
+
+def flatten_grid(priced, shape):
+    """Broadcast priced grid arrays to `shape` and flatten them to one row per cell"""
+    flat = {}
+    for key, values in priced.items():
+        trailing = np.shape(values)[len(shape):]
+        flat[key] = np.broadcast_to(values, tuple(shape) + trailing).reshape((-1,) + trailing)
+    return flat
+
+
+def _rounded(values):
+    """Round half-to-even like Python's round() and return plain ints"""
+    return np.rint(values).astype(np.int64).tolist()
+
+
+ACCURACY_LEVEL = '±7–9% (material take-off based)'
+
+# BOQ display rows in MATERIAL_NAMES order: label, unit
+BOQ_LINES = (
+    ('Cement', 'bag'),
+    ('Steel', 'kg'),
+    ('Bricks', 'pcs'),
+    ('Sand', 'cft'),
+    ('Crush', 'cft')
+)
+
+
+def build_estimates(priced):
+    """Turn priced arrays into the per-project `estimate` response payloads"""
+    columns = {key: _rounded(priced[key]) for key in
+               ('material_cost', 'labor_cost', 'equipment_cost', 'finishes_cost',
+                'other_costs', 'total_cost', 'duration_days')}
+    quantities = _rounded(priced['quantities'])
+    boq_rates = _rounded(priced['unit_rates'])
+    boq_totals = _rounded(priced['material_totals'])
+
+    estimates = []
+    for i in range(len(columns['total_cost'])):
+        estimates.append({
+            'material_cost': columns['material_cost'][i],
+            'labor_cost': columns['labor_cost'][i],
+            'equipment_cost': columns['equipment_cost'][i],
+            'finishes_cost': columns['finishes_cost'][i],
+            'other_costs': columns['other_costs'][i],
+            'total_cost': columns['total_cost'][i],
+            'estimated_duration_days': columns['duration_days'][i],
+            'material_boq': [
+                {'material': label, 'unit': unit, 'quantity': quantities[i][j],
+                 'rate': boq_rates[i][j], 'total': boq_totals[i][j]}
+                for j, (label, unit) in enumerate(BOQ_LINES)
+            ],
+            'accuracy_level': ACCURACY_LEVEL
+        })
+    return estimates
@@ -1,16 +1,88 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app import db
-from app.database import Estimate, City, Material
+from app.database import Estimate, EstimateGraph, City
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
+from app.cache import LRUCache
+from app import costgraph, rate_history
+from app.engine import COST_COMPONENTS, SWEEP_AXES, parse_project, pricing_key, price_projects, price_inputs
+from app.engine import build_estimates, estimate_request, flatten_grid, sweep_inputs
+from app.idempotency import idempotent
+from app.export import EXPORT_FORMATS, export_filters, export_response
+from app.pagination import keyset_page, wants_cursor, wants_total
+from app.persistence import await_flush, save_estimates
+from app.ratelimit import rate_limited
+from app.rates import get_snapshot
+from app.rollups import record_estimates
+from app.simulation import MAX_SAMPLES, simulate
+import json
+import numpy as np
+import time
 
 estimate_bp = Blueprint('estimate', __name__)
 
-QUALITY_FACTORS = {
-    'standard': 1.0,
-    'premium': 1.10,
-    'luxury': 1.20
-}
+_result_cache = None
+
+def get_result_cache():
+    """Memoized estimate payloads keyed on (rate version, pricing inputs)"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = LRUCache(
+            maxsize=current_app.config.get('ESTIMATE_CACHE_SIZE', 10000),
+            ttl=current_app.config.get('ESTIMATE_CACHE_TTL', 3600)
+        )
+    return _result_cache
+
+def rate_epochs(snapshot, as_of):
+    """Resolve per-project as_of datetimes (None = current rates) to timeline epochs"""
+    if not any(when is not None for when in as_of):
+        return None, [None] * len(as_of)
+    timeline = rate_history.get_timeline(snapshot)
+    epochs = []
+    for when in as_of:
+        epoch = None if when is None else timeline.epoch(when)
+        if epoch == 0:
+            raise LookupError(f'No rates were recorded on or before {when.isoformat()}')
+        epochs.append(epoch)
+    return timeline, epochs
+
+def rates_at(as_of=None):
+    """RateTable in effect at `as_of` (current rates when None)"""
+    snapshot = get_snapshot()
+    timeline, (epoch,) = rate_epochs(snapshot, [as_of])
+    return snapshot.table if epoch is None else timeline.table(epoch)
+
+def parse_as_of(value):
+    """Optional as_of request value -> datetime; raises ValueError with a client message"""
+    if not value:
+        return None
+    try:
+        return rate_history.parse_as_of(value)
+    except (ValueError, TypeError):
+        raise ValueError('as_of must be an ISO date (YYYY-MM-DD) or datetime')
+
+def price(projects, as_of=None):
+    """Price parsed projects, reusing cached results for repeated inputs
+    
+    `as_of` optionally holds one datetime per project (None = current rates).
+    """
+    snapshot = get_snapshot()
+    cache = get_result_cache()
+    timeline, epochs = rate_epochs(snapshot, as_of or [None] * len(projects))
+    keys = [(snapshot.version, epoch) + pricing_key(p) for p, epoch in zip(projects, epochs)]
+    results = [cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    # One vectorized pass per distinct rate table
+    groups = {}
+    for i in missing:
+        groups.setdefault(epochs[i], []).append(i)
+    for epoch, indexes in groups.items():
+        table = snapshot.table if epoch is None else timeline.table(epoch)
+        priced = build_estimates(price_projects([projects[i] for i in indexes], table))
+        for i, result in zip(indexes, priced):
+            cache.set(keys[i], result)
+            results[i] = result
+    # Callers add estimate_id, so hand out shallow copies of cached payloads
+    return [dict(result) for result in results]
 
 # ================= SIMPLE ENDPOINTS =================
 @estimate_bp.route('/cities', methods=['GET'])
@@ -26,10 +98,31 @@ def get_history():
     try:
         user = get_jwt_identity()
         user_id = user.get('id') if isinstance(user, dict) else int(user)
+        # Include estimates still queued by the batched writer
+        await_flush()
 
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
 
+        if wants_cursor(request.args):
+            try:
+                result = keyset_page(
+                    Estimate.query.filter_by(user_id=user_id),
+                    Estimate,
+                    cursor=request.args.get('cursor'),
+                    limit=per_page,
+                    include_total=wants_total(request.args)
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            return jsonify({
+                'success': True,
+                'estimates': [e.to_dict() for e in result['items']],
+                'next_cursor': result['next_cursor'],
+                'prev_cursor': result['prev_cursor'],
+                'total': result['total']
+            }), 200
+
         pagination = Estimate.query.filter_by(user_id=user_id)\
             .order_by(Estimate.created_at.desc())\
             .paginate(page=page, per_page=per_page, error_out=False)
@@ -45,9 +138,53 @@ def get_history():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@estimate_bp.route('/history/export', methods=['GET'])
+@jwt_required()
+def export_history():
+    """Stream the current user's estimates as CSV or NDJSON"""
+    try:
+        user = get_jwt_identity()
+        user_id = user.get('id') if isinstance(user, dict) else int(user)
+
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': 'format must be csv or ndjson'}), 400
+        try:
+            filters = export_filters(request.args)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'start and end must be YYYY-MM-DD'}), 400
+
+        await_flush()
+        return export_response([Estimate.user_id == user_id] + filters, fmt, 'my_estimates')
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ================= CALCULATION ENDPOINT =================
+def _estimate_values(user_id, project, result):
+    """Column values of the Estimate row for a priced project"""
+    return {
+        'user_id': user_id,
+        'project_name': project['project_name'],
+        'total_area': project['area'],
+        'location': project['location'],
+        'num_rooms': project['rooms'],
+        'ceiling_height': project['ceiling_height'],
+        'material_quality': project['quality'].capitalize(),
+        'includes_finishes': project['includes_finishes'],
+        'finishes_quality': project['finishes_quality'].capitalize(),
+        'num_floors': project['floors'],
+        'material_cost': result['material_cost'],
+        'labor_cost': result['labor_cost'],
+        'equipment_cost': result['equipment_cost'],
+        'finishes_cost': result['finishes_cost'],
+        'other_costs': result['other_costs'],
+        'total_cost': result['total_cost']
+    }
+
 @estimate_bp.route('/calculate', methods=['POST'])
 @jwt_required()
+@idempotent
+@rate_limited
 def calculate():
     try:
         data = request.get_json()
@@ -57,130 +194,300 @@ def calculate():
         user = get_jwt_identity()
         user_id = user.get('id') if isinstance(user, dict) else int(user)
 
-        # -------- INPUTS --------
-        area = float(data.get('projectSize', 0))
-        location = data.get('location', 'Karachi')
-        quality = data.get('materialQuality', 'standard').lower()
-        floors = int(data.get('floors', 1))
-        rooms = int(data.get('rooms', 0))
-        ceiling_height = data.get('ceilingHeight', '10')
-        includes_finishes = data.get('finishes', 'No') == 'Yes'
-        finishes_quality = data.get('finishesQuality', 'standard').lower()
-        project_name = data.get('projectName', 'Untitled Project')
-
-        if area <= 0:
+        project = parse_project(data)
+        if project['area'] <= 0:
             return jsonify({'success': False, 'error': 'Invalid area'}), 400
 
-        # -------- LABOR RATE --------
-        city = City.query.filter_by(name=location).first()
-        if not city:
-            city = City.query.filter_by(name='Karachi').first()
-        labor_rate = city.labor_rate_per_sqft
-        labor_cost = area * labor_rate * floors
-
-        # -------- MATERIAL QUANTITY TAKE-OFF --------
-        effective_area = area * floors
-        qf = QUALITY_FACTORS.get(quality, 1.0)
-
-        # Fetch material rates from DB
-        materials = Material.query.all()
-        material_dict = {m.name.lower(): m for m in materials}
-
-        # Get rates from DB
-        cement_rate = getattr(material_dict.get('cement'), f"{quality}_rate", 0) or 0
-        steel_rate = getattr(material_dict.get('steel bars'), f"{quality}_rate", 0) or 0
-        bricks_rate = getattr(material_dict.get('bricks'), f"{quality}_rate", 0) or 0
-        sand_rate = getattr(material_dict.get('sand'), f"{quality}_rate", 0) or 0
-        crush_rate = getattr(material_dict.get('crush'), f"{quality}_rate", 0) or 0
-
-        # Quantities
-        cement_bags = effective_area * 0.40 * qf
-        steel_kg = effective_area * 3.50 * qf
-        bricks_qty = effective_area * 8
-        sand_cft = effective_area * 1.20
-        crush_cft = effective_area * 0.90
-
-        # ---- NORMALIZE UNITS ----
-        # Bricks: rate is per 1000 pcs
-        bricks_cost = (bricks_qty / 1000) * bricks_rate
-        # Sand & Crush: rate is per truck (~1000 cft per truck)
-        sand_cost = (sand_cft / 1000) * sand_rate
-        crush_cost = (crush_cft / 1000) * crush_rate
-
-        cement_cost = cement_bags * cement_rate
-        steel_cost = steel_kg * steel_rate
-
-        material_cost = sum([cement_cost, steel_cost, bricks_cost, sand_cost, crush_cost])
-
-        material_boq = [
-            {'material': 'Cement', 'unit': 'bag', 'quantity': round(cement_bags), 'rate': round(cement_rate), 'total': round(cement_cost)},
-            {'material': 'Steel', 'unit': 'kg', 'quantity': round(steel_kg), 'rate': round(steel_rate), 'total': round(steel_cost)},
-            {'material': 'Bricks', 'unit': 'pcs', 'quantity': round(bricks_qty), 'rate': round(bricks_rate / 1000), 'total': round(bricks_cost)},
-            {'material': 'Sand', 'unit': 'cft', 'quantity': round(sand_cft), 'rate': round(sand_rate / 1000), 'total': round(sand_cost)},
-            {'material': 'Crush', 'unit': 'cft', 'quantity': round(crush_cft), 'rate': round(crush_rate / 1000), 'total': round(crush_cost)}
-        ]
-
-        # -------- EQUIPMENT --------
-        equipment_cost = labor_cost * 0.18
-
-        # -------- FINISHES --------
-        finishes_cost = 0
-        if includes_finishes:
-            finishes_rates = {'standard': 450, 'premium': 750, 'luxury': 1300}
-            finishes_cost = area * finishes_rates.get(finishes_quality, 450) * floors
-
-        # -------- OTHER COSTS --------
-        room_cost = rooms * 60000
-        sub_total = material_cost + labor_cost + equipment_cost + finishes_cost
-        other_costs = sub_total * 0.12
-
-        # -------- CEILING HEIGHT --------
-        ceiling_multiplier = {'10': 1.0, '12': 1.12, '14': 1.25}.get(ceiling_height, 1.0)
-
-        total_cost = round((sub_total + other_costs) * ceiling_multiplier + room_cost)
-
-        # -------- SAVE TO DB --------
-        estimate = Estimate(
-            user_id=user_id,
-            project_name=project_name,
-            total_area=area,
-            location=location,
-            num_rooms=rooms,
-            ceiling_height=ceiling_height,
-            material_quality=quality.capitalize(),
-            includes_finishes=includes_finishes,
-            finishes_quality=finishes_quality.capitalize(),
-            num_floors=floors,
-            material_cost=round(material_cost),
-            labor_cost=round(labor_cost),
-            equipment_cost=round(equipment_cost),
-            finishes_cost=round(finishes_cost),
-            other_costs=round(other_costs),
-            total_cost=total_cost
-        )
-        db.session.add(estimate)
-        db.session.commit()
+        # -------- PRICE (batch of one), optionally at past rates --------
+        try:
+            as_of = parse_as_of(data.get('as_of'))
+            result = price([project], [as_of])[0]
+        except (ValueError, LookupError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        # -------- OPTIONAL MONTE CARLO BANDS (not cached) --------
+        options = data.get('simulate')
+        if options:
+            options = options if isinstance(options, dict) else {}
+            try:
+                samples = int(options.get('samples', current_app.config.get('SIMULATION_SAMPLES', 10000)))
+            except (ValueError, TypeError):
+                samples = 0
+            if not 1 <= samples <= MAX_SAMPLES:
+                return jsonify({'success': False, 'error': f'samples must be between 1 and {MAX_SAMPLES}'}), 400
+            started = time.perf_counter()
+            try:
+                result['simulation'] = simulate(
+                    project,
+                    rates_at(as_of),
+                    samples=samples,
+                    distributions=dict(current_app.config.get('SIMULATION_DISTRIBUTIONS') or {},
+                                       **(options.get('distributions') or {})),
+                    seed=options.get('seed')
+                )
+            except (ValueError, KeyError, TypeError) as e:
+                return jsonify({'success': False, 'error': f'Invalid simulation options: {e}'}), 400
+            result['simulation']['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+        # -------- SAVE TO DB (as-of lookups are not saved) --------
+        if as_of is not None:
+            result['as_of'] = as_of.isoformat()
+            result['estimate_id'] = None
+        else:
+            result['estimate_id'] = save_estimates([_estimate_values(user_id, project, result)])[0]
+        return jsonify({'success': True, 'estimate': result}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@estimate_bp.route('/calculate/batch', methods=['POST'])
+@jwt_required()
+@rate_limited
+def calculate_batch():
+    """Price and save many projects in a single vectorized pass"""
+    try:
+        data = request.get_json()
+        projects_data = data.get('projects') if isinstance(data, dict) else data
+        if not projects_data or not isinstance(projects_data, list):
+            return jsonify({'success': False, 'error': 'No projects provided'}), 400
+
+        user = get_jwt_identity()
+        user_id = user.get('id') if isinstance(user, dict) else int(user)
+
+        started = time.perf_counter()
+        default_as_of = data.get('as_of') if isinstance(data, dict) else None
+        parsed_as_of = {}
+        projects = []
+        as_of = []
+        for index, item in enumerate(projects_data):
+            try:
+                project = parse_project(item or {})
+                # Per-project as_of overrides the batch one; parse each distinct value once
+                raw = (item or {}).get('as_of', default_as_of)
+                key = str(raw) if raw else None
+                if key not in parsed_as_of:
+                    parsed_as_of[key] = parse_as_of(raw)
+            except (ValueError, TypeError, AttributeError) as e:
+                return jsonify({'success': False, 'error': str(e), 'index': index}), 400
+            if project['area'] <= 0:
+                return jsonify({'success': False, 'error': 'Invalid area', 'index': index}), 400
+            projects.append(project)
+            as_of.append(parsed_as_of[key])
+
+        try:
+            results = price(projects, as_of)
+        except LookupError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        # As-of lookups are returned but not saved
+        saved = [i for i, when in enumerate(as_of) if when is None]
+        ids = save_estimates([_estimate_values(user_id, projects[i], results[i]) for i in saved]) if saved else []
+        for result, when in zip(results, as_of):
+            result['estimate_id'] = None
+            if when is not None:
+                result['as_of'] = when.isoformat()
+        for i, estimate_id in zip(saved, ids):
+            results[i]['estimate_id'] = estimate_id
+        elapsed = time.perf_counter() - started
 
         return jsonify({
             'success': True,
-            'estimate': {
-                'material_cost': round(material_cost),
-                'labor_cost': round(labor_cost),
-                'equipment_cost': round(equipment_cost),
-                'finishes_cost': round(finishes_cost),
-                'other_costs': round(other_costs),
-                'total_cost': total_cost,
-                'estimated_duration_days': max(45, round((area / 1000) * 45 * floors)),
-                'material_boq': material_boq,
-                'accuracy_level': '±7–9% (material take-off based)',
-                'estimate_id': estimate.id
-            }
+            'estimates': results,
+            'count': len(results),
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'projects_per_second': round(len(results) / elapsed) if elapsed > 0 else None
         }), 200
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ================= INCREMENTAL EDIT =================
+@estimate_bp.route('/<int:estimate_id>', methods=['PATCH'])
+@jwt_required()
+def update_estimate(estimate_id):
+    """Change some inputs of a saved estimate and re-price only what depends on them"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+        user = get_jwt_identity()
+        user_id = user.get('id') if isinstance(user, dict) else int(user)
+
+        estimate = Estimate.query.filter_by(id=estimate_id, user_id=user_id).first()
+        if not estimate:
+            # Just calculated and still queued by the batched writer?
+            await_flush()
+            estimate = Estimate.query.filter_by(id=estimate_id, user_id=user_id).first()
+        if not estimate:
+            return jsonify({'success': False, 'error': 'Estimate not found'}), 404
+
+        saved = estimate_request(estimate)
+        try:
+            project = parse_project(dict(saved, **data))
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if project['area'] <= 0:
+            return jsonify({'success': False, 'error': 'Invalid area'}), 400
+
+        table = get_snapshot().table
+        graph = db.session.get(EstimateGraph, estimate_id)
+        if graph:
+            memo = json.loads(graph.node_values)
+        else:
+            # First edit: /calculate doesn't build graphs, so seed one from the saved inputs
+            memo, _ = costgraph.evaluate(parse_project(saved), table)
+        values, recomputed = costgraph.evaluate(project, table, memo)
+
+        # -------- UPDATE IN PLACE --------
+        old_row = {name: getattr(estimate, name) for name in (
+            'created_at', 'total_cost', 'total_area', 'location', 'material_quality', 'num_floors')}
+        result = costgraph.estimate_payload(values)
+        for name, value in _estimate_values(user_id, project, result).items():
+            setattr(estimate, name, value)
+        record_estimates(db.session, [old_row], sign=-1)
+        record_estimates(db.session, [estimate])
+
+        if graph:
+            graph.node_values = json.dumps(values)
+        else:
+            db.session.add(EstimateGraph(estimate_id=estimate_id, node_values=json.dumps(values)))
+        db.session.commit()
+
+        result['estimate_id'] = estimate_id
+        return jsonify({'success': True, 'estimate': result, 'recomputed': recomputed}), 200
+
+    except LookupError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ================= SCENARIO SWEEP =================
+MAX_SWEEP_CELLS = 10000
+
+@estimate_bp.route('/sweep', methods=['POST'])
+@jwt_required()
+def sweep():
+    """Price every combination of the given option lists without saving anything"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+        # Lists are sweep axes; everything else describes the base project
+        base = parse_project({k: v for k, v in data.items() if not isinstance(v, list)})
+        if base['area'] <= 0:
+            return jsonify({'success': False, 'error': 'Invalid area'}), 400
+
+        axes = {}
+        axis_values = []
+        for key, project_key, normalize in SWEEP_AXES:
+            values = data.get(key)
+            values = [normalize(v) for v in values] if isinstance(values, list) else [base[project_key]]
+            if not values:
+                return jsonify({'success': False, 'error': f'{key} must not be empty'}), 400
+            axes[key] = values
+            axis_values.append(values)
+
+        shape = tuple(len(values) for values in axis_values)
+        cells = 1
+        for size in shape:
+            cells *= size
+        if cells > MAX_SWEEP_CELLS:
+            return jsonify({
+                'success': False,
+                'error': f'Sweep has {cells} combinations; the limit is {MAX_SWEEP_CELLS}'
+            }), 400
+
+        priced = price_inputs(sweep_inputs(base, axis_values, get_snapshot().table))
+        totals = np.rint(np.broadcast_to(priced['total_cost'], shape)).astype(np.int64)
+
+        response = {
+            'success': True,
+            'axes': axes,
+            'shape': list(shape),
+            'totals': totals.tolist(),
+            'min_total': int(totals.min()),
+            'max_total': int(totals.max())
+        }
+
+        if request.args.get('breakdown', '').lower() in ('1', 'true', 'yes'):
+            # One full estimate per cell, in row-major order of the grid
+            estimates = build_estimates(flatten_grid(priced, shape))
+            for index, estimate in zip(np.ndindex(*shape), estimates):
+                estimate['scenario'] = {key: axes[key][i] for (key, _, _), i in zip(SWEEP_AXES, index)}
+            response['cells'] = estimates
+
+        return jsonify(response), 200
+
+    except (ValueError, TypeError, LookupError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ================= CITY COMPARISON =================
+@estimate_bp.route('/compare-cities', methods=['POST'])
+@jwt_required()
+def compare_cities():
+    """Price one project in every city (or the listed `cities`) in one pass, cheapest first"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+        started = time.perf_counter()
+        base = parse_project({k: v for k, v in data.items() if k not in ('cities', 'as_of')})
+        if base['area'] <= 0:
+            return jsonify({'success': False, 'error': 'Invalid area'}), 400
+        rates = rates_at(parse_as_of(data.get('as_of')))
+
+        names = data.get('cities') or list(rates.city_names)
+        if not isinstance(names, list):
+            return jsonify({'success': False, 'error': 'cities must be a list of city names'}), 400
+        names = list(dict.fromkeys(str(name) for name in names))
+        unknown = [name for name in names if name not in rates.city_index]
+        if unknown:
+            return jsonify({'success': False, 'error': f'Unknown cities: {", ".join(unknown)}'}), 400
+        if not names:
+            return jsonify({'success': False, 'error': 'No cities to compare'}), 400
+
+        # A sweep over the location axis only
+        axis_values = [names] + [[base[project_key]] for _, project_key, _ in SWEEP_AXES[1:]]
+        shape = (len(names),) + (1,) * (len(SWEEP_AXES) - 1)
+        flat = flatten_grid(price_inputs(sweep_inputs(base, axis_values, rates)), shape)
+        costs = np.rint(np.column_stack([flat[name] for name in COST_COMPONENTS])).astype(np.int64)
+
+        order = np.argsort(costs[:, -1], kind='stable')
+        # Deltas are against the project's own city when compared, else the cheapest
+        baseline = names.index(base['location']) if base['location'] in names else int(order[0])
+        deltas = costs - costs[baseline]
+        baseline_total = costs[baseline, -1]
+
+        ranking = []
+        for rank, i in enumerate(order.tolist(), start=1):
+            entry = {'rank': rank, 'city': names[i]}
+            entry.update(zip(COST_COMPONENTS, costs[i].tolist()))
+            entry['delta'] = dict(zip(COST_COMPONENTS, deltas[i].tolist()))
+            entry['delta_percent'] = round(100.0 * deltas[i, -1] / baseline_total, 2) if baseline_total else None
+            ranking.append(entry)
+
+        return jsonify({
+            'success': True,
+            'baseline': names[baseline],
+            'cities': ranking,
+            'count': len(ranking),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }), 200
+
+    except (ValueError, TypeError, LookupError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ================= TEST =================
 @estimate_bp.route('/test', methods=['GET'])
 def test():
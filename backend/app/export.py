@@ -0,0 +1,113 @@
+"""
+Streaming estimate export.
+
+Rows are read with a column-only SELECT and a server-side cursor
+(yield_per) and written out chunk by chunk as CSV or NDJSON, so memory
+stays flat no matter how many estimates are exported.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+from app import db
+from app.database import Estimate, User, estimate_row_to_dict
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+CHUNK_ROWS = 1000
+
+# Spreadsheets evaluate text cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Same keys, in the same order, as Estimate.to_dict()
+ESTIMATE_FIELDS = (
+    'id', 'project_name', 'total_area', 'location', 'num_rooms', 'room_length',
+    'room_width', 'ceiling_height', 'material_quality', 'includes_finishes',
+    'finishes_quality', 'num_floors', 'material_cost', 'labor_cost',
+    'equipment_cost', 'finishes_cost', 'other_costs', 'total_cost',
+    'created_at', 'user_id'
+)
+
+
+def export_filters(args):
+    """Build WHERE clauses from start/end (YYYY-MM-DD), location and quality args"""
+    filters = []
+    if args.get('start'):
+        start = date.fromisoformat(args['start'])
+        filters.append(Estimate.created_at >= datetime.combine(start, datetime.min.time()))
+    if args.get('end'):
+        end = date.fromisoformat(args['end']) + timedelta(days=1)
+        filters.append(Estimate.created_at < datetime.combine(end, datetime.min.time()))
+    if args.get('location'):
+        filters.append(Estimate.location == args['location'])
+    if args.get('quality'):
+        filters.append(Estimate.material_quality == args['quality'].capitalize())
+    return filters
+
+
+def export_response(filters, fmt, filename, include_user=False):
+    """Stream matching estimates (newest first) as a CSV or NDJSON download"""
+    columns = list(Estimate.__table__.columns)
+    stmt = select(*columns)
+    if include_user:
+        stmt = select(*columns, User.name.label('user_name'), User.email.label('user_email'))\
+            .select_from(Estimate).outerjoin(User, User.id == Estimate.user_id)
+    stmt = stmt.where(*filters)\
+        .order_by(Estimate.created_at.desc(), Estimate.id.desc())\
+        .execution_options(yield_per=CHUNK_ROWS)
+
+    def rows():
+        for row in db.session.execute(stmt):
+            data = estimate_row_to_dict(row)
+            if include_user:
+                data['user_name'] = row.user_name
+                data['user_email'] = row.user_email
+            yield data
+
+    fields = ESTIMATE_FIELDS + (('user_name', 'user_email') if include_user else ())
+    body = _ndjson(rows()) if fmt == 'ndjson' else _csv(rows(), fields)
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}.{fmt}'}
+    )
+
+
+def _csv(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    count = 0
+    for data in rows:
+        writer.writerow({key: _csv_cell(value) for key, value in data.items()})
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _csv_cell(value):
+    """Quote user-entered text that a spreadsheet would run as a formula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _ndjson(rows):
+    chunk = []
+    for data in rows:
+        chunk.append(json.dumps(data))
+        if len(chunk) == CHUNK_ROWS:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
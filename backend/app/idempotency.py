@@ -0,0 +1,154 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+A request carrying an Idempotency-Key header first claims (user, key) with
+an INSERT into idempotency_keys, whose unique index makes the claim atomic
+across workers. The successful response is stored on that row and in an
+in-process LRU with a TTL, so a retry or double submit gets the original
+response back (with an Idempotent-Replayed header) without recomputing or
+inserting anything. Failed responses release the claim so the client can
+try again. A claim that never gets a response (its worker died mid-request)
+is a lease: after IDEMPOTENCY_LEASE seconds the next retry takes it over
+instead of getting 409 until the key expires.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.cache import LRUCache
+from app.database import IdempotencyKey
+
+MAX_KEY_LENGTH = 100
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(
+            maxsize=current_app.config.get('IDEMPOTENCY_CACHE_SIZE', 10000),
+            ttl=current_app.config.get('IDEMPOTENCY_TTL', 86400)
+        )
+    return _cache
+
+
+def fingerprint():
+    """Hash of the request body, insensitive to JSON key order and whitespace"""
+    data = request.get_json(silent=True)
+    raw = json.dumps(data, sort_keys=True).encode('utf-8') if data is not None else request.get_data()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _replay(status, body):
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _mismatch():
+    return jsonify({
+        'success': False,
+        'error': 'Idempotency-Key was already used with a different request body'
+    }), 422
+
+
+def _rows(user_id, key):
+    table = IdempotencyKey.__table__
+    return table, (table.c.user_id == user_id) & (table.c.key == key)
+
+
+def _claim(user_id, key, digest):
+    """Insert the claim row; returns None when claimed, else an early response"""
+    db.session.add(IdempotencyKey(user_id=user_id, key=key, fingerprint=digest))
+    try:
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+
+    existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    now = datetime.utcnow()
+    ttl = timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL', 86400))
+    lease = timedelta(seconds=current_app.config.get('IDEMPOTENCY_LEASE', 30))
+    if existing is not None and existing.created_at and (
+            existing.created_at < now - ttl or
+            (existing.response is None and existing.created_at < now - lease)):
+        # Expired, or an abandoned claim: take it over, unless another request just did
+        table, where = _rows(user_id, key)
+        result = db.session.execute(
+            table.update().where(where, table.c.created_at == existing.created_at)
+            .values(fingerprint=digest, status_code=None, response=None, created_at=now))
+        db.session.commit()
+        if result.rowcount == 1:
+            return None
+        existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+
+    if existing is None or existing.response is None:
+        response = jsonify({
+            'success': False,
+            'error': 'A request with this Idempotency-Key is still being processed'
+        })
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+    if existing.fingerprint != digest:
+        return _mismatch()
+    get_cache().set((user_id, key), (digest, existing.status_code, existing.response))
+    return _replay(existing.status_code, existing.response)
+
+
+def idempotent(view):
+    """Replay the stored response for a repeated Idempotency-Key (use under jwt_required)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({
+                'success': False,
+                'error': f'Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters'
+            }), 400
+
+        user = get_jwt_identity()
+        user_id = user.get('id') if isinstance(user, dict) else int(user)
+        digest = fingerprint()
+
+        cached = get_cache().get((user_id, key))
+        if cached is not None:
+            cached_digest, status, body = cached
+            return _replay(status, body) if cached_digest == digest else _mismatch()
+
+        early = _claim(user_id, key, digest)
+        if early is not None:
+            return early
+
+        table, where = _rows(user_id, key)
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            db.session.execute(table.delete().where(where))
+            db.session.commit()
+            raise
+
+        if 200 <= response.status_code < 300:
+            body = response.get_data(as_text=True)
+            db.session.execute(table.update().where(where)
+                               .values(status_code=response.status_code, response=body))
+            db.session.commit()
+            get_cache().set((user_id, key), (digest, response.status_code, body))
+        else:
+            db.session.rollback()
+            db.session.execute(table.delete().where(where))
+            db.session.commit()
+        return response
+    return wrapper
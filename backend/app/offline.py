@@ -0,0 +1,174 @@
+"""
+Offline batch pricing for `python -m app.cli estimate`.
+
+Input rows (CSV or JSONL, using the /calculate request keys) are streamed
+in chunks to a process pool. Every worker decodes the rate table once and
+prices its chunks with the same vectorized engine as the API, and results
+are written out in input order as they complete, so memory stays bounded
+by the number of chunks in flight.
+"""
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.engine import COST_COMPONENTS, parse_project, price_projects
+from app.shared_rates import decode_table, encode_table
+
+FORMATS = ('csv', 'jsonl')
+
+RESULT_FIELDS = COST_COMPONENTS + ('estimated_duration_days', 'error')
+
+_worker_table = None
+
+
+def detect_format(path, given=None):
+    """Explicit format, else the file extension (stdin/stdout default to csv)"""
+    if given:
+        return given
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return 'jsonl' if extension in ('jsonl', 'ndjson', 'json') else 'csv'
+
+
+class InvalidRow(dict):
+    """Stand-in for an unreadable JSONL line; price_rows() emits it as an error row"""
+
+    def __init__(self, message):
+        super().__init__()
+        self.message = message
+
+
+def read_rows(stream, fmt):
+    """Yield one dict per input row"""
+    if fmt == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield InvalidRow(f'line {number}: invalid JSON ({e})')
+                continue
+            if not isinstance(row, dict):
+                yield InvalidRow(f'line {number}: expected a JSON object, got {type(row).__name__}')
+                continue
+            yield row
+    else:
+        yield from csv.DictReader(stream)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def price_rows(rows, table):
+    """Price a chunk of raw rows; each result is the row plus RESULT_FIELDS"""
+    projects = []
+    valid = []
+    errors = {}
+    for i, row in enumerate(rows):
+        try:
+            if isinstance(row, InvalidRow):
+                raise ValueError(row.message)
+            if not isinstance(row, dict):
+                raise TypeError(f'expected an object, got {type(row).__name__}')
+            project = parse_project(row)
+            if project['area'] <= 0:
+                raise ValueError('Invalid area')
+            table.city_row(project['location'])
+        except (ValueError, TypeError, AttributeError, LookupError) as e:
+            errors[i] = str(e)
+            continue
+        projects.append(project)
+        valid.append(i)
+
+    results = [dict(row) if isinstance(row, dict) else {} for row in rows]
+    if projects:
+        priced = price_projects(projects, table)
+        columns = {name: np.rint(priced[name]).astype(np.int64).tolist() for name in COST_COMPONENTS}
+        days = np.rint(priced['duration_days']).astype(np.int64).tolist()
+        for j, i in enumerate(valid):
+            results[i].update({name: columns[name][j] for name in COST_COMPONENTS})
+            results[i]['estimated_duration_days'] = days[j]
+            results[i]['error'] = None
+    for i, message in errors.items():
+        results[i].update(dict.fromkeys(RESULT_FIELDS))
+        results[i]['error'] = message
+    return results
+
+
+def _init_worker(payload):
+    global _worker_table
+    _worker_table = decode_table(payload)
+
+
+def _price_chunk(rows):
+    return price_rows(rows, _worker_table)
+
+
+class RowWriter:
+    """Streams result rows as CSV (header from the first row) or JSONL"""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self._csv = None
+
+    def write(self, rows):
+        if self.fmt == 'jsonl':
+            self.stream.write(''.join(json.dumps(row) + '\n' for row in rows))
+            return
+        if self._csv is None and rows:
+            fields = [name for name in rows[0] if name not in RESULT_FIELDS] + list(RESULT_FIELDS)
+            self._csv = csv.DictWriter(self.stream, fieldnames=fields, extrasaction='ignore')
+            self._csv.writeheader()
+        self._csv.writerows(rows)
+
+
+def run(table, source, sink, in_fmt, out_fmt, chunk_size=5000, workers=None, progress_every=2.0):
+    """Price every row of `source` into `sink`; returns (rows, errors, seconds)"""
+    workers = workers or os.cpu_count() or 1
+    writer = RowWriter(sink, out_fmt)
+    chunks = chunked(read_rows(source, in_fmt), chunk_size)
+    started = last_report = time.perf_counter()
+    done = errors = 0
+
+    def emit(results):
+        nonlocal done, errors, last_report
+        writer.write(results)
+        done += len(results)
+        errors += sum(1 for row in results if row['error'])
+        now = time.perf_counter()
+        if progress_every and now - last_report >= progress_every:
+            last_report = now
+            print(f"   {done} rows, {done / (now - started):,.0f} rows/s", file=sys.stderr, flush=True)
+
+    if workers == 1:
+        for chunk in chunks:
+            emit(price_rows(chunk, table))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(encode_table(table),)) as pool:
+            # Keep a bounded window of chunks in flight and write them in input order
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_price_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    emit(pending.popleft().result())
+            while pending:
+                emit(pending.popleft().result())
+
+    return done, errors, time.perf_counter() - started
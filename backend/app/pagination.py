@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+Cursors are opaque url-safe tokens holding the boundary row's key and the
+direction to move in, so deep pages cost the same as the first one.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(row, direction):
+    key = [row.created_at.isoformat() if row.created_at else None, row.id, direction]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (created_at, id, direction); raise ValueError for bad tokens"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev'):
+            raise ValueError
+        return datetime.fromisoformat(created_at), int(row_id), direction
+    except (TypeError, ValueError, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def wants_cursor(args):
+    """Keyset mode is used whenever a `cursor` argument is sent (empty = first page)"""
+    return 'cursor' in args
+
+
+def wants_total(args):
+    return args.get('include_total', '').lower() in ('1', 'true', 'yes')
+
+
+def keyset_page(query, model, cursor=None, limit=20, include_total=False):
+    """Fetch one page of `query` ordered by (created_at, id) descending"""
+    total = query.order_by(None).count() if include_total else None
+    direction = 'next'
+
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        if direction == 'next':
+            query = query.filter(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id)
+            ))
+        else:
+            query = query.filter(or_(
+                model.created_at > created_at,
+                and_(model.created_at == created_at, model.id > row_id)
+            ))
+
+    if direction == 'next':
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if direction == 'prev' or has_more:
+            next_cursor = encode_cursor(rows[-1], 'next')
+        if (direction == 'next' and cursor) or (direction == 'prev' and has_more):
+            prev_cursor = encode_cursor(rows[0], 'prev')
+
+    return {
+        'items': rows,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'total': total
+    }
@@ -0,0 +1,119 @@
+"""
+Password hashing off the request thread.
+
+bcrypt is deliberately CPU-bound, so hashing and verification run in a
+small process pool (PASSWORD_HASH_WORKERS) instead of on the Flask worker
+that received the request. The number of hashes queued or running is
+capped at PASSWORD_HASH_QUEUE; beyond that PasswordPoolBusy is raised at
+once and the auth routes answer 503 with Retry-After, so a login burst
+cannot tie up the threads serving estimates.
+
+The cost factor is Flask-Bcrypt's BCRYPT_LOG_ROUNDS. Hashes made with a
+different cost keep verifying, and needs_rehash() tells login to upgrade
+them. PASSWORD_HASH_WORKERS=0 hashes inline (no pool).
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt as _bcrypt
+from flask import current_app
+
+
+class PasswordPoolBusy(Exception):
+    """Too many password hashes are already queued"""
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_in_flight = 0
+
+
+def _hash(password, rounds):
+    return _bcrypt.hashpw(password, _bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verify(password, password_hash):
+    try:
+        return _bcrypt.checkpw(password, password_hash)
+    except ValueError:
+        # Malformed stored hash
+        return False
+
+
+def _get_pool(workers):
+    global _pool, _pool_pid
+    # A pool inherited through fork (e.g. a preloading server) is unusable
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def _release(future=None):
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def _run(fn, *args):
+    """Run fn in the pool, failing fast when the queue is full
+
+    A slot is held until the hash actually finishes (or is cancelled before
+    it starts), not just until the caller stops waiting, so timed-out hashes
+    still count against PASSWORD_HASH_QUEUE while they occupy the pool.
+    """
+    global _in_flight
+    config = current_app.config
+    workers = config.get('PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return fn(*args)
+
+    with _lock:
+        if _in_flight >= config.get('PASSWORD_HASH_QUEUE', workers * 8):
+            raise PasswordPoolBusy()
+        _in_flight += 1
+        pool = _get_pool(workers)
+    try:
+        future = pool.submit(fn, *args)
+    except Exception:
+        _release()
+        raise
+    future.add_done_callback(_release)
+    try:
+        return future.result(timeout=config.get('PASSWORD_HASH_TIMEOUT', 10))
+    except TimeoutError:
+        # Frees the slot now if the hash has not started yet
+        future.cancel()
+        raise PasswordPoolBusy()
+
+
+def hash_password(password):
+    """bcrypt hash of `password` at the configured cost"""
+    return _run(_hash, password.encode('utf-8'), current_app.config.get('BCRYPT_LOG_ROUNDS', 12))
+
+
+def check_password(password_hash, password):
+    return bool(password_hash) and _run(_verify, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_rounds(password_hash):
+    """Cost factor recorded in a bcrypt hash ($2b$12$... -> 12), or None"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash):
+    return hash_rounds(password_hash) != current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+
+
+def pool_stats():
+    workers = current_app.config.get('PASSWORD_HASH_WORKERS', 0)
+    return {
+        'workers': workers,
+        'queue_limit': current_app.config.get('PASSWORD_HASH_QUEUE', workers * 8),
+        'in_flight': _in_flight
+    }
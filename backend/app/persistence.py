@@ -0,0 +1,304 @@
+"""
+Estimate persistence.
+
+ESTIMATE_WRITE_MODE selects how /calculate stores its rows:
+
+* 'sync' (default): insert and commit before the response is sent.
+* 'batched': ids are pre-allocated in blocks from the id_blocks table and
+  rows are handed to a background writer that flushes them with
+  multi-row INSERTs every ESTIMATE_FLUSH_ROWS rows or ESTIMATE_FLUSH_MS
+  milliseconds. Pending rows are drained on shutdown.
+
+A batch that keeps failing is retried row by row; rows that still cannot
+be written are appended to ESTIMATE_SPILL_PATH (JSON lines) and logged,
+and the next writer to start replays that file, so acknowledged estimates
+are never dropped. Reads that must see a just-calculated estimate (history,
+PATCH, admin estimate routes) call await_flush() first, which waits -
+at most about one flush interval - for the rows queued before it.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.database import Estimate, IdBlock
+from app.rollups import record_estimates
+
+_writer = None
+
+
+class IdAllocator:
+    """Hands out ids from blocks reserved atomically in id_blocks"""
+
+    def __init__(self, engine, table, block_size=1000):
+        self.engine = engine
+        self.table = table
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._limit = 0
+
+    def allocate(self, count):
+        with self._lock:
+            ids = []
+            while len(ids) < count:
+                if self._next >= self._limit:
+                    self._reserve(max(self.block_size, count - len(ids)))
+                take = min(count - len(ids), self._limit - self._next)
+                ids.extend(range(self._next, self._next + take))
+                self._next += take
+            return ids
+
+    def _reserve(self, size):
+        blocks = IdBlock.__table__
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(blocks.c.next_id).where(blocks.c.name == self.table.name).with_for_update()
+            ).first()
+            # Never hand out ids below rows inserted by the sync path
+            start = (conn.execute(select(func.max(self.table.c.id))).scalar() or 0) + 1
+            if row is None:
+                conn.execute(blocks.insert().values(name=self.table.name, next_id=start + size))
+            else:
+                start = max(start, row.next_id)
+                conn.execute(blocks.update().where(blocks.c.name == self.table.name)
+                             .values(next_id=start + size))
+        self._next, self._limit = start, start + size
+
+
+class EstimateWriter:
+    """Background thread that batches estimate inserts"""
+
+    def __init__(self, app, flush_rows=500, flush_ms=200, id_block=1000, spill_path=None):
+        self.app = app
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_ms / 1000.0
+        self.id_block = id_block
+        self.spill_path = spill_path
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._done = threading.Condition()
+        self._submitted = 0
+        self._written = 0
+        self._thread = None
+        self._pid = None
+        self._allocator = None
+        self.flushed = 0
+        self.failed = 0
+
+    def submit(self, rows):
+        """Assign ids to row dicts, queue them and return the ids"""
+        self._ensure_started()
+        ids = self._allocator.allocate(len(rows))
+        with self._done:
+            for row, estimate_id in zip(rows, ids):
+                row['id'] = estimate_id
+                self._queue.put(row)
+            self._submitted += len(rows)
+        return ids
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def await_flush(self, timeout=5.0):
+        """Wait until every row submitted so far has been written (or spilled)"""
+        if self._pid != os.getpid():
+            return True
+        with self._done:
+            target = self._submitted
+            return self._done.wait_for(lambda: self._written >= target, timeout)
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so (re)start lazily in each worker
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            with self.app.app_context():
+                engine = db.engine
+            self._allocator = IdAllocator(engine, Estimate.__table__, self.id_block)
+            self._engine = engine
+            self._queue = queue.Queue()
+            self._submitted = self._written = 0
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='estimate-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            self._replay_spill()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+            elif self._stopping:
+                return
+
+    def _collect(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if row is None:
+                self._stopping = True
+                # Drain whatever is already queued, then exit
+                while True:
+                    try:
+                        row = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if row is not None:
+                        batch.append(row)
+                break
+            batch.append(row)
+        return batch
+
+    def _flush(self, batch):
+        try:
+            for attempt in range(3):
+                try:
+                    with self._engine.begin() as conn:
+                        insert_estimate_rows(conn, batch)
+                    self.flushed += len(batch)
+                    return
+                except Exception as e:
+                    self.app.logger.warning(f"Estimate writer flush failed (attempt {attempt + 1}): {str(e)}")
+                    time.sleep(0.1 * (attempt + 1))
+            self._flush_rows(batch)
+        finally:
+            with self._done:
+                self._written += len(batch)
+                self._done.notify_all()
+
+    def _flush_rows(self, batch):
+        """One transaction per row, so a bad row cannot sink the rest; spill what still fails"""
+        unwritten = []
+        for row in batch:
+            try:
+                with self._engine.begin() as conn:
+                    insert_estimate_rows(conn, [row])
+                self.flushed += 1
+            except IntegrityError:
+                # Already stored (e.g. a replayed spill row): ids are unique
+                if not self._exists(row['id']):
+                    unwritten.append(row)
+            except Exception:
+                unwritten.append(row)
+        if unwritten:
+            self.failed += len(unwritten)
+            self._spill(unwritten)
+
+    def _exists(self, estimate_id):
+        try:
+            with self._engine.connect() as conn:
+                table = Estimate.__table__
+                return conn.execute(select(table.c.id).where(table.c.id == estimate_id)).first() is not None
+        except Exception:
+            return False
+
+    def _spill(self, rows):
+        ids = ', '.join(str(row['id']) for row in rows)
+        if not self.spill_path:
+            self.app.logger.error(f"Could not write estimates {ids} and no ESTIMATE_SPILL_PATH is set")
+            return
+        with open(self.spill_path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, default=lambda value: value.isoformat()) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.app.logger.error(f"Could not write estimates {ids}; saved to {self.spill_path} "
+                              f"and will retry when the writer restarts")
+
+    def _replay_spill(self):
+        """Queue rows spilled by an earlier writer"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        replaying = f'{self.spill_path}.{os.getpid()}'
+        try:
+            os.replace(self.spill_path, replaying)
+        except OSError:
+            # Another worker took it
+            return
+        count = 0
+        with open(replaying, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if row.get('created_at'):
+                    row['created_at'] = datetime.fromisoformat(row['created_at'])
+                self._queue.put(row)
+                count += 1
+        with self._done:
+            self._submitted += count
+        os.remove(replaying)
+        self.app.logger.warning(f"Replaying {count} spilled estimates from {self.spill_path}")
+
+    def stop(self, timeout=30):
+        """Flush everything queued and stop the writer thread"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+def insert_estimate_rows(conn, rows):
+    """Multi-row INSERT of estimate column dicts, plus their rollup deltas"""
+    conn.execute(Estimate.__table__.insert(), rows)
+    record_estimates(conn, rows)
+
+
+def init_app(app):
+    """Start write-behind persistence when ESTIMATE_WRITE_MODE is 'batched'"""
+    global _writer
+    if app.config.get('ESTIMATE_WRITE_MODE') != 'batched':
+        return
+    _writer = EstimateWriter(
+        app,
+        flush_rows=app.config['ESTIMATE_FLUSH_ROWS'],
+        flush_ms=app.config['ESTIMATE_FLUSH_MS'],
+        id_block=app.config['ESTIMATE_ID_BLOCK'],
+        spill_path=app.config.get('ESTIMATE_SPILL_PATH')
+    )
+    atexit.register(_writer.stop)
+
+
+def get_writer():
+    return _writer
+
+
+def await_flush():
+    """Read-your-writes: wait for queued estimates before reading them back"""
+    if _writer is not None:
+        _writer.await_flush()
+
+
+def save_estimates(rows):
+    """Persist estimate column dicts and return their ids"""
+    now = datetime.utcnow()
+    for row in rows:
+        row.setdefault('created_at', now)
+    if _writer is not None:
+        return _writer.submit(rows)
+    estimates = [Estimate(**row) for row in rows]
+    db.session.add_all(estimates)
+    db.session.flush()
+    record_estimates(db.session, rows)
+    ids = [estimate.id for estimate in estimates]
+    db.session.commit()
+    return ids
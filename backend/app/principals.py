@@ -0,0 +1,64 @@
+"""
+Cached principals (the signed-in user's public fields) for authorization.
+
+admin_required, /auth/profile and /auth/refresh resolve the JWT identity
+through get_principal(), which keeps user.to_dict() in a small LRU with a
+short TTL instead of querying users on every request. Admin changes to a
+user call invalidate() after committing, which applies them immediately in
+this process. Deactivations and role changes also revoke the user's tokens
+(revocation.revoke_user), and a cached principal loaded before the user's
+latest revocation cutoff is reloaded, so other processes pick the change
+up at their next blocklist sync (REVOCATION_SYNC_SECONDS) rather than
+after PRINCIPAL_CACHE_TTL.
+
+Tokens also carry `role` and `is_active` claims (token_claims()) for the
+client; authorization itself always uses the principal.
+"""
+import time
+
+from flask import current_app
+
+from app import revocation
+from app.cache import LRUCache
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(
+            maxsize=current_app.config.get('PRINCIPAL_CACHE_SIZE', 10000),
+            ttl=current_app.config.get('PRINCIPAL_CACHE_TTL', 30)
+        )
+    return _cache
+
+
+def token_claims(principal):
+    """Additional JWT claims for a principal (user.to_dict())"""
+    return {'role': principal['role'], 'is_active': bool(principal['is_active'])}
+
+
+def get_principal(user_id):
+    """user.to_dict() for `user_id`, or None if the user does not exist"""
+    cache = get_cache()
+    entry = cache.get(user_id)
+    # Cutoffs are whole seconds taken before the admin's commit; the extra
+    # second covers loads that raced that commit
+    if entry is not None and not revocation.revoked_since(user_id, int(entry[1]) - 1):
+        return entry[0]
+
+    from app import db
+    from app.database import User
+
+    loaded_at = time.time()
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    principal = user.to_dict()
+    cache.set(user_id, (principal, loaded_at))
+    return principal
+
+
+def invalidate(user_id):
+    get_cache().pop(user_id)
@@ -0,0 +1,177 @@
+"""
+Time-versioned rates for as-of pricing.
+
+Every admin write to a material or city appends a row to
+material_rate_history / city_rate_history; rows are never updated. The
+rates in effect at time T are, per entity, the latest row with
+valid_from <= T (the (entity_id, valid_from) indexes serve that lookup).
+
+For pricing, all history is loaded once per rate snapshot version into a
+RateTimeline: the sorted list of change points is an interval index, so
+resolving an as_of time is one bisect, and the RateTable of each interval
+is built on first use and cached. Pricing a batch at past dates costs the
+same per project as pricing at current rates.
+"""
+import bisect
+import threading
+from collections import defaultdict
+from datetime import date, datetime, time
+
+from app.cache import LRUCache
+
+# valid_from of baseline rows for rates that existed before history was kept
+BASELINE = datetime(1970, 1, 1)
+
+_lock = threading.Lock()
+_timeline = None
+
+
+def record_material(session, material, removed=False, valid_from=None):
+    """Append the current state of `material` (flush first so it has an id)"""
+    from app.database import MaterialRateHistory
+
+    session.add(MaterialRateHistory(
+        material_id=material.id,
+        name=material.name,
+        standard_rate=material.standard_rate,
+        premium_rate=material.premium_rate,
+        luxury_rate=material.luxury_rate,
+        removed=removed,
+        valid_from=valid_from or datetime.utcnow()
+    ))
+
+
+def record_city(session, city, removed=False, valid_from=None):
+    """Append the current state of `city` (flush first so it has an id)"""
+    from app.database import CityRateHistory
+
+    session.add(CityRateHistory(
+        city_id=city.id,
+        name=city.name,
+        labor_rate_per_sqft=city.labor_rate_per_sqft,
+        removed=removed,
+        valid_from=valid_from or datetime.utcnow()
+    ))
+
+
+def backfill(session):
+    """Add BASELINE rows for materials and cities without any history; returns the count"""
+    from app.database import City, CityRateHistory, Material, MaterialRateHistory
+
+    added = 0
+    for model, history, key, record in ((Material, MaterialRateHistory, 'material_id', record_material),
+                                        (City, CityRateHistory, 'city_id', record_city)):
+        missing = session.query(model)\
+            .outerjoin(history, getattr(history, key) == model.id)\
+            .filter(history.id.is_(None)).all()
+        for entity in missing:
+            record(session, entity, valid_from=BASELINE)
+        added += len(missing)
+    return added
+
+
+def parse_as_of(value):
+    """Parse an ISO date or datetime; a bare date means the end of that day"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time.max)
+    value = str(value).strip()
+    if len(value) == 10:
+        return datetime.combine(date.fromisoformat(value), time.max)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # Stored times are naive UTC
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+class RateTimeline:
+    """Interval index over every rate change, with a RateTable per interval"""
+
+    def __init__(self, materials, cities, cost_models, table_cache_size=64):
+        # Per entity: sorted valid_from list and the matching history rows
+        self._materials = self._index(materials, 'material_id')
+        self._cities = self._index(cities, 'city_id')
+        # (created_at, version, params) sorted by time
+        self._cost_models = sorted(cost_models, key=lambda m: (m[0], m[1]))
+        self._cost_model_times = [m[0] for m in self._cost_models]
+        self.change_points = sorted(
+            {row.valid_from for row in materials} | {row.valid_from for row in cities}
+            | set(self._cost_model_times))
+        self._tables = LRUCache(maxsize=table_cache_size, ttl=None)
+
+    @staticmethod
+    def _index(rows, key):
+        index = defaultdict(lambda: ([], []))
+        for row in sorted(rows, key=lambda r: (getattr(r, key), r.valid_from, r.id)):
+            times, states = index[getattr(row, key)]
+            times.append(row.valid_from)
+            states.append(row)
+        return dict(index)
+
+    @classmethod
+    def from_db(cls):
+        """Load all history as plain rows (one ordered index scan per table)"""
+        from sqlalchemy import select
+
+        from app import db
+        from app.database import CityRateHistory, CostModelParam, CostModelVersion, MaterialRateHistory
+
+        def rows(model, *order_by):
+            return db.session.execute(select(*model.__table__.columns).order_by(*order_by)).all()
+
+        params = defaultdict(list)
+        for param in rows(CostModelParam, CostModelParam.id):
+            params[param.version].append(param)
+        cost_models = [(v.created_at or BASELINE, v.version, params[v.version])
+                       for v in rows(CostModelVersion, CostModelVersion.version)]
+        return cls(
+            rows(MaterialRateHistory, MaterialRateHistory.material_id, MaterialRateHistory.valid_from),
+            rows(CityRateHistory, CityRateHistory.city_id, CityRateHistory.valid_from),
+            cost_models
+        )
+
+    def epoch(self, as_of):
+        """Index of the interval containing `as_of`; 0 means before any recorded rate"""
+        return bisect.bisect_right(self.change_points, as_of)
+
+    def table(self, epoch):
+        """RateTable in effect during interval `epoch` (>= 1)"""
+        table = self._tables.get(epoch)
+        if table is None:
+            table = self._build(self.change_points[epoch - 1])
+            self._tables.set(epoch, table)
+        return table
+
+    def _build(self, when):
+        from app.engine import RateTable, compile_model
+
+        materials = self._state_at(self._materials, when)
+        cities = self._state_at(self._cities, when)
+        i = bisect.bisect_right(self._cost_model_times, when)
+        _, model_version, params = self._cost_models[i - 1] if i else (None, 0, [])
+        city_names = [c.name for c in cities]
+        return RateTable.from_rows(cities, materials, model=compile_model(city_names, params),
+                                   model_version=model_version)
+
+    @staticmethod
+    def _state_at(index, when):
+        rows = []
+        for times, states in index.values():
+            i = bisect.bisect_right(times, when)
+            if i and not states[i - 1].removed:
+                rows.append(states[i - 1])
+        return rows
+
+
+def get_timeline(snapshot):
+    """The RateTimeline for a rate snapshot, reloaded whenever rates change"""
+    global _timeline
+    timeline = _timeline
+    if timeline is None or timeline[0] != snapshot.version:
+        with _lock:
+            timeline = _timeline
+            if timeline is None or timeline[0] != snapshot.version:
+                timeline = _timeline = (snapshot.version, RateTimeline.from_db())
+    return timeline[1]
@@ -0,0 +1,226 @@
+"""
+Token-bucket rate limiting for expensive endpoints.
+
+Budgets come from RATE_LIMITS (set in config.py), keyed by endpoint name
+and then by scope - 'ip' (client address) or 'user' (JWT identity) - with
+a bucket capacity (burst) and a refill rate in tokens per second. A request
+takes one token from each of its buckets; if any is empty it gets a 429
+with Retry-After set to when the next token is due, and the tokens it
+already took from its other buckets are given back. Apply @rate_limited
+under @idempotent so replayed responses cost no tokens.
+
+Buckets live in a store with take() and refund() methods:
+
+* MemoryStore - per process, keys spread over striped locks
+* SharedStore - a memory-mapped slot table with per-slot fcntl locks, so
+  every worker process on the host draws from the same buckets
+
+RATE_LIMIT_STORE selects 'memory' or 'shared'; any object with matching
+methods can be passed instead (e.g. one backed by a shared cache server).
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+try:
+    import fcntl
+except ImportError:  # Windows: the shared store is only safe within one process
+    fcntl = None
+
+STRIPES = 64
+
+_lock = threading.Lock()
+_store = None
+_counters = {}
+
+
+def _refill(tokens, last, capacity, per_second, now):
+    """Take one token; returns (allowed, tokens left, seconds until the next token)"""
+    tokens = min(capacity, tokens + max(0.0, now - last) * per_second)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / per_second
+
+
+class MemoryStore:
+    """Buckets of this process, spread over STRIPES locks"""
+
+    def __init__(self, max_buckets=100000):
+        self._stripes = [(threading.Lock(), OrderedDict()) for _ in range(STRIPES)]
+        self._per_stripe = max(1, max_buckets // STRIPES)
+
+    def take(self, key, capacity, per_second):
+        lock, buckets = self._stripes[hash(key) % STRIPES]
+        with lock:
+            now = time.monotonic()
+            tokens, last = buckets.pop(key, (capacity, now))
+            allowed, tokens, retry_after = _refill(tokens, last, capacity, per_second, now)
+            buckets[key] = (tokens, now)
+            if len(buckets) > self._per_stripe:
+                # An evicted (least recently used) bucket comes back full
+                buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def refund(self, key, capacity):
+        """Give back a token taken by take()"""
+        lock, buckets = self._stripes[hash(key) % STRIPES]
+        with lock:
+            if key in buckets:
+                tokens, last = buckets[key]
+                buckets[key] = (min(capacity, tokens + 1), last)
+
+
+class SharedStore:
+    """Buckets in a memory-mapped file shared by every process on the host
+
+    Slots are direct-mapped by key hash: (key hash, tokens, last refill).
+    A key that lands on a slot owned by another key takes it over with a
+    full bucket. Each take locks only its own slot.
+    """
+    SLOT = struct.Struct('<Qdd')
+
+    def __init__(self, path, slots=65536):
+        self.slots = slots
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, 'r+b')
+        size = slots * self.SLOT.size
+        if os.fstat(fd).st_size < size:
+            self._file.truncate(size)
+        self._mm = mmap.mmap(fd, size)
+        self._locks = [threading.Lock() for _ in range(STRIPES)]
+
+    def _slot(self, key):
+        digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+        return digest, digest % self.slots
+
+    @contextmanager
+    def _locked(self, slot):
+        offset = slot * self.SLOT.size
+        with self._locks[slot % STRIPES]:
+            if fcntl is not None:
+                fcntl.lockf(self._file.fileno(), fcntl.LOCK_EX, self.SLOT.size, offset)
+            try:
+                yield offset
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._file.fileno(), fcntl.LOCK_UN, self.SLOT.size, offset)
+
+    def take(self, key, capacity, per_second):
+        digest, slot = self._slot(key)
+        with self._locked(slot) as offset:
+            # Wall clock: comparable across processes and restarts
+            now = time.time()
+            owner, tokens, last = self.SLOT.unpack_from(self._mm, offset)
+            if owner != digest:
+                tokens, last = capacity, now
+            allowed, tokens, retry_after = _refill(tokens, last, capacity, per_second, now)
+            self.SLOT.pack_into(self._mm, offset, digest, tokens, now)
+        return allowed, retry_after
+
+    def refund(self, key, capacity):
+        """Give back a token taken by take()"""
+        digest, slot = self._slot(key)
+        with self._locked(slot) as offset:
+            owner, tokens, last = self.SLOT.unpack_from(self._mm, offset)
+            if owner == digest:
+                self.SLOT.pack_into(self._mm, offset, digest, min(capacity, tokens + 1), last)
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                configured = current_app.config.get('RATE_LIMIT_STORE', 'memory')
+                if hasattr(configured, 'take'):
+                    _store = configured
+                elif configured == 'shared':
+                    _store = SharedStore(current_app.config['RATE_LIMIT_PATH'])
+                else:
+                    _store = MemoryStore(current_app.config.get('RATE_LIMIT_MAX_BUCKETS', 100000))
+    return _store
+
+
+def _client_key(scope):
+    if scope == 'ip':
+        return request.remote_addr or 'unknown'
+    if scope == 'user':
+        try:
+            identity = get_jwt_identity()
+        except RuntimeError:
+            # Not a JWT-protected route
+            return None
+        return str(identity) if identity is not None else None
+    raise ValueError(f'Unknown rate limit scope: {scope}')
+
+
+def _count(endpoint, scope, outcome):
+    with _lock:
+        counters = _counters.setdefault((endpoint, scope), {'allowed': 0, 'limited': 0})
+        counters[outcome] += 1
+
+
+def check(endpoint):
+    """Take a token from each bucket of this request; returns seconds to wait (0 if admitted)
+
+    A denied request keeps none of its tokens: stops at the first empty
+    bucket and refunds the ones taken before it.
+    """
+    budgets = current_app.config.get('RATE_LIMITS', {}).get(endpoint)
+    if not budgets or not current_app.config.get('RATE_LIMIT_ENABLED', True):
+        return 0
+    store = get_store()
+    taken = []
+    for scope, budget in budgets.items():
+        key = _client_key(scope)
+        if key is None:
+            continue
+        bucket = f'{endpoint}:{scope}:{key}'
+        allowed, retry_after = store.take(bucket, budget['capacity'], budget['per_second'])
+        _count(endpoint, scope, 'allowed' if allowed else 'limited')
+        if not allowed:
+            for taken_bucket, taken_budget in taken:
+                store.refund(taken_bucket, taken_budget['capacity'])
+            return retry_after
+        taken.append((bucket, budget))
+    return 0
+
+
+def rate_limited(view):
+    """Apply the RATE_LIMITS budget of the endpoint (under jwt_required for 'user' budgets)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        wait = check(request.endpoint)
+        if wait:
+            response = jsonify({
+                'success': False,
+                'error': 'Too many requests. Please slow down and try again shortly.'
+            })
+            response.status_code = 429
+            response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+            return response
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def stats():
+    """Allowed/limited counts per endpoint and scope in this process"""
+    with _lock:
+        counters = {f'{endpoint}:{scope}': dict(values) for (endpoint, scope), values in _counters.items()}
+    store = _store
+    return {
+        'enabled': current_app.config.get('RATE_LIMIT_ENABLED', True),
+        'store': type(store).__name__ if store is not None else None,
+        'budgets': current_app.config.get('RATE_LIMITS', {}),
+        'counters': counters
+    }
@@ -0,0 +1,100 @@
+"""
+Rate snapshot cache.
+
+City and Material rates only change through the admin routes, so the
+calculation path reads them from an immutable snapshot instead of the
+database. Admin writes call refresh_rates(), which loads a new snapshot
+and swaps it in with a single reference assignment.
+
+When RATE_TABLE_PATH is set the snapshot is also published to a shared
+memory-mapped table (see app.shared_rates). Its generation is the
+snapshot version, so every worker on the host picks up a change on its
+next request without querying the database. Each process publishes a
+fresh table from the database on first use, so rate changes made outside
+the admin routes are picked up on restart.
+"""
+import threading
+
+from flask import current_app
+
+from app.engine import RateTable
+
+_lock = threading.Lock()
+_snapshot = None
+_shared = None
+
+
+class RateSnapshot:
+    """Immutable, versioned copy of every rate the engine needs"""
+    __slots__ = ('version', 'table')
+
+    def __init__(self, version, table):
+        self.version = version
+        self.table = table
+
+
+def _shared_table():
+    """The process-wide SharedRateTable, or None when sharing is disabled"""
+    global _shared
+    if _shared is None:
+        path = current_app.config.get('RATE_TABLE_PATH')
+        _shared = False
+        if path:
+            from app.shared_rates import SharedRateTable
+            try:
+                _shared = SharedRateTable(path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Shared rate table disabled: {str(e)}")
+    return _shared or None
+
+
+def get_snapshot():
+    """Return the current snapshot, loading or re-reading it when stale"""
+    snapshot = _snapshot
+    shared = _shared_table()
+    if shared is not None:
+        if snapshot is None:
+            # First use in this process: the file outlives restarts, so it
+            # may predate a restore, migrate/seed or direct SQL changes
+            with _lock:
+                snapshot = _snapshot
+                if snapshot is None:
+                    return _publish(shared)
+        if shared.generation() != snapshot.version:
+            with _lock:
+                generation, table = shared.read()
+                if table is None:
+                    return _publish(shared)
+                snapshot = _swap(RateSnapshot(generation, table))
+    elif snapshot is None:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None:
+                snapshot = _swap(RateSnapshot(1, RateTable.from_db()))
+    return snapshot
+
+
+def get_rates():
+    """Shortcut for the RateTable of the current snapshot"""
+    return get_snapshot().table
+
+
+def refresh_rates():
+    """Reload rates after an admin write and bump the version"""
+    shared = _shared_table()
+    with _lock:
+        if shared is not None:
+            return _publish(shared)
+        version = _snapshot.version + 1 if _snapshot is not None else 1
+        return _swap(RateSnapshot(version, RateTable.from_db()))
+
+
+def _publish(shared):
+    table = RateTable.from_db()
+    return _swap(RateSnapshot(shared.publish(table), table))
+
+
+def _swap(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+    return snapshot
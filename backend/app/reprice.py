@@ -0,0 +1,181 @@
+"""
+Bulk repricing of saved estimates after rate changes.
+
+A job walks the estimates matching its filters in id order, REPRICE_CHUNK_ROWS
+at a time. Each chunk is its own short transaction: the rows are locked
+(SELECT ... FOR UPDATE where the database supports it), repriced with the
+vectorized engine, written back with one executemany UPDATE, and the job's
+checkpoint (last_id) and counters advance in the same commit. A stopped or
+crashed job therefore resumes exactly after its last committed chunk, and
+live traffic only ever waits on one small chunk.
+
+Estimates created after the job starts (id > max_id) are already priced
+with the new rates and are left alone. Rows that cannot be priced (e.g. no
+rates for their city) are skipped and counted rather than failing the job.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import bindparam, func, select
+
+from app import db
+from app.database import Estimate, RepriceJob
+from app.engine import COST_COMPONENTS, estimate_request, parse_project, price_projects
+from app.export import export_filters
+from app.rates import get_snapshot
+from app.rollups import record_estimates
+
+# A running job whose heartbeat is older than this is assumed dead
+STALE_AFTER = timedelta(minutes=2)
+
+_UPDATE = Estimate.__table__.update()\
+    .where(Estimate.__table__.c.id == bindparam('b_id'))\
+    .values(**{name: bindparam(f'b_{name}') for name in COST_COMPONENTS})
+
+
+def create_job(filters, chunk_size, user_id=None):
+    """Record a new job over the estimates that exist right now"""
+    conditions = export_filters(filters)
+    max_id = db.session.query(func.max(Estimate.id)).scalar() or 0
+    total = db.session.query(func.count(Estimate.id)).filter(Estimate.id <= max_id, *conditions).scalar()
+    job = RepriceJob(
+        status='pending',
+        filters=json.dumps(filters),
+        chunk_size=chunk_size,
+        max_id=max_id,
+        total=total,
+        created_by=user_id
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim(job_id):
+    """Mark a job running unless another live runner owns it; returns True on success"""
+    table = RepriceJob.__table__
+    now = datetime.utcnow()
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id == job_id)
+        .where((table.c.status.in_(('pending', 'paused', 'failed'))) |
+               ((table.c.status == 'running') &
+                ((table.c.heartbeat_at.is_(None)) | (table.c.heartbeat_at < now - STALE_AFTER))))
+        .values(status='running', error=None, heartbeat_at=now, finished_at=None)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def run_job(job_id, pause_ms=0, progress=None):
+    """Process chunks until the job completes, fails or is paused
+
+    Must run inside an app context after claim(). `progress` is called
+    with the job dict after every chunk.
+    """
+    job = db.session.get(RepriceJob, job_id)
+    conditions = export_filters(json.loads(job.filters) if job.filters else {})
+    chunk_size, max_id = job.chunk_size, job.max_id
+    db.session.remove()
+
+    try:
+        while True:
+            started = time.perf_counter()
+            with db.engine.begin() as conn:
+                if not _process_chunk(conn, job_id, conditions, chunk_size, max_id, started):
+                    break
+            if progress is not None:
+                progress(db.session.get(RepriceJob, job_id).to_dict())
+                db.session.remove()
+            if pause_ms:
+                time.sleep(pause_ms / 1000.0)
+    except Exception as e:
+        print(f"❌ Reprice job {job_id} failed: {str(e)}")
+        db.session.rollback()
+        db.session.execute(RepriceJob.__table__.update()
+                           .where(RepriceJob.__table__.c.id == job_id)
+                           .values(status='failed', error=str(e)))
+        db.session.commit()
+    finally:
+        db.session.remove()
+
+
+def _process_chunk(conn, job_id, conditions, chunk_size, max_id, started):
+    """Reprice the next chunk; returns False when the job should stop"""
+    jobs = RepriceJob.__table__
+    job = conn.execute(select(jobs.c.status, jobs.c.last_id)
+                       .where(jobs.c.id == job_id).with_for_update()).first()
+    if job is None or job.status != 'running':
+        return False
+
+    estimates = Estimate.__table__
+    rows = conn.execute(
+        select(*estimates.columns)
+        .where(estimates.c.id > job.last_id, estimates.c.id <= max_id, *conditions)
+        .order_by(estimates.c.id)
+        .limit(chunk_size)
+        .with_for_update()
+    ).all()
+    if not rows:
+        conn.execute(jobs.update().where(jobs.c.id == job_id)
+                     .values(status='completed', finished_at=datetime.utcnow()))
+        return False
+
+    table = get_snapshot().table
+    priceable, projects = [], []
+    for row in rows:
+        try:
+            project = parse_project(estimate_request(row))
+            table.city_row(project['location'])
+        except (ValueError, TypeError, LookupError) as e:
+            print(f"⚠️  Reprice job {job_id}: skipping estimate {row.id}: {str(e)}")
+            continue
+        priceable.append(row)
+        projects.append(project)
+
+    changed = []
+    if priceable:
+        priced = price_projects(projects, table)
+        new_costs = np.column_stack([np.rint(priced[name]) for name in COST_COMPONENTS])
+        old_costs = np.array([[getattr(row, name) or 0 for name in COST_COMPONENTS] for row in priceable],
+                             dtype=np.float64)
+        changed = np.flatnonzero((new_costs != old_costs).any(axis=1))
+
+    if len(changed):
+        params = []
+        new_rows = []
+        for i in changed:
+            costs = dict(zip(COST_COMPONENTS, new_costs[i].tolist()))
+            params.append(dict({f'b_{name}': value for name, value in costs.items()}, b_id=priceable[i].id))
+            new_rows.append(dict(priceable[i]._asdict(), **costs))
+        conn.execute(_UPDATE, params)
+        record_estimates(conn, [priceable[i] for i in changed], sign=-1)
+        record_estimates(conn, new_rows)
+
+    conn.execute(jobs.update().where(jobs.c.id == job_id).values(
+        last_id=rows[-1].id,
+        processed=jobs.c.processed + len(rows),
+        updated=jobs.c.updated + len(changed),
+        skipped=jobs.c.skipped + (len(rows) - len(priceable)),
+        elapsed_ms=jobs.c.elapsed_ms + (time.perf_counter() - started) * 1000,
+        heartbeat_at=datetime.utcnow()
+    ))
+    return True
+
+
+def start_job(app, job_id):
+    """Run a claimed job on a background thread of this process
+
+    If the process exits mid-chunk that chunk's transaction rolls back and
+    the job can be resumed from its checkpoint once its heartbeat is stale.
+    """
+    def target():
+        with app.app_context():
+            run_job(job_id, pause_ms=app.config.get('REPRICE_PAUSE_MS', 0))
+
+    thread = threading.Thread(target=target, name=f'reprice-{job_id}', daemon=True)
+    thread.start()
+    return thread
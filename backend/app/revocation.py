@@ -0,0 +1,203 @@
+"""
+Token revocation (JWT blocklist).
+
+Two kinds of revocation are stored in revoked_tokens:
+
+* a single token (logout): the 64-bit key of its jti, until the token expires
+* every token of a user issued up to a point in time (deactivation, deletion):
+  a cutoff row, kept until the longest-lived token issued before it expires
+
+Each process keeps all unexpired revocations in memory - a dict of jti keys
+and a dict of user cutoffs - so the per-request check in the
+token_in_blocklist_loader is two dict lookups however many tokens are
+revoked. Revocations made by other processes are pulled in with one
+indexed query on revoked_at at most every REVOCATION_SYNC_SECONDS (with
+some overlap, so rows committed late are not missed), and expired entries
+are dropped from memory and from the table every REVOCATION_PRUNE_SECONDS.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+# Re-read this much history on every sync to catch slow commits and clock skew
+SYNC_OVERLAP = timedelta(seconds=60)
+
+_lock = threading.Lock()
+_blocklist = None
+
+
+def jti_key(jti):
+    """Signed 64-bit key of a jti (what is stored and kept in memory)"""
+    return int.from_bytes(hashlib.blake2b(jti.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def _timestamp(value):
+    return int((value - datetime(1970, 1, 1)).total_seconds())
+
+
+class Blocklist:
+    """In-memory revocations; readers never lock, writers hold _lock"""
+
+    def __init__(self):
+        self.tokens = {}    # jti key -> expiry (unix seconds)
+        self.cutoffs = {}   # user id -> (latest revoked iat, expiry)
+        self.synced_at = 0.0
+        self.synced_until = None
+        self.pruned_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.tokens) + len(self.cutoffs)
+
+    def add_token(self, key, expires):
+        self.tokens[key] = expires
+
+    def add_cutoff(self, user_id, revoked_at, expires):
+        current = self.cutoffs.get(user_id)
+        if current is None or current[0] < revoked_at:
+            self.cutoffs[user_id] = (revoked_at, max(expires, current[1] if current else 0))
+
+    def add_row(self, row):
+        if row.jti_key is not None:
+            self.add_token(row.jti_key, _timestamp(row.expires_at))
+        elif row.user_id is not None:
+            self.add_cutoff(row.user_id, _timestamp(row.revoked_at), _timestamp(row.expires_at))
+
+    def is_revoked(self, payload):
+        jti = payload.get('jti')
+        if jti is not None and jti_key(jti) in self.tokens:
+            return True
+        if self.cutoffs:
+            try:
+                cutoff = self.cutoffs.get(int(payload.get('sub')))
+            except (TypeError, ValueError):
+                return False
+            return cutoff is not None and payload.get('iat', 0) <= cutoff[0]
+        return False
+
+    def prune(self, now):
+        """Drop expired entries (rebuilt and swapped, so readers are never blocked)"""
+        self.tokens = {key: exp for key, exp in self.tokens.items() if exp > now}
+        self.cutoffs = {user_id: cutoff for user_id, cutoff in self.cutoffs.items() if cutoff[1] > now}
+
+
+def _read(blocklist, condition):
+    from sqlalchemy import select
+
+    from app import db
+    from app.database import RevokedToken
+
+    table = RevokedToken.__table__
+    started = datetime.utcnow()
+    # Own connection: never touches the request's session or its pending work
+    with db.engine.connect() as conn:
+        rows = conn.execute(
+            select(table.c.jti_key, table.c.user_id, table.c.revoked_at, table.c.expires_at)
+            .where(condition(table))
+        ).all()
+    for row in rows:
+        blocklist.add_row(row)
+    blocklist.synced_until = started
+    blocklist.synced_at = time.monotonic()
+
+
+def _load():
+    blocklist = Blocklist()
+    _read(blocklist, lambda table: table.c.expires_at > datetime.utcnow())
+    return blocklist
+
+
+def _sync(blocklist):
+    """Pull revocations made by other processes; prune when due"""
+    from app import db
+    from app.database import RevokedToken
+
+    since = blocklist.synced_until - SYNC_OVERLAP
+    _read(blocklist, lambda table: table.c.revoked_at >= since)
+
+    now = time.monotonic()
+    if now - blocklist.pruned_at >= current_app.config.get('REVOCATION_PRUNE_SECONDS', 3600):
+        blocklist.pruned_at = now
+        blocklist.prune(time.time())
+        table = RevokedToken.__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.expires_at <= datetime.utcnow()))
+
+
+def get_blocklist():
+    """This process's Blocklist, synced with the table at most every REVOCATION_SYNC_SECONDS"""
+    global _blocklist
+    blocklist = _blocklist
+    if blocklist is None:
+        with _lock:
+            if _blocklist is None:
+                _blocklist = _load()
+            return _blocklist
+
+    interval = current_app.config.get('REVOCATION_SYNC_SECONDS', 5)
+    if time.monotonic() - blocklist.synced_at >= interval and _lock.acquire(blocking=False):
+        # One thread syncs; the others keep checking against the current entries
+        try:
+            _sync(blocklist)
+        except Exception as e:
+            print(f"⚠️  Token blocklist sync failed: {str(e)}")
+            blocklist.synced_at = time.monotonic()
+        finally:
+            _lock.release()
+    return blocklist
+
+
+def is_revoked(payload):
+    return get_blocklist().is_revoked(payload)
+
+
+def revoked_since(user_id, timestamp):
+    """Whether the user has a cutoff (revoke_user) at or after `timestamp` (unix seconds)"""
+    cutoff = get_blocklist().cutoffs.get(user_id)
+    return cutoff is not None and cutoff[0] >= timestamp
+
+
+def revoke_token(payload):
+    """Revoke one decoded token until it expires (adds to the caller's transaction)"""
+    from app import db
+    from app.database import RevokedToken
+
+    expires_at = datetime.utcfromtimestamp(payload['exp']) if payload.get('exp') \
+        else datetime.utcnow() + timedelta(seconds=_max_token_lifetime())
+    key = jti_key(payload['jti'])
+    if db.session.query(RevokedToken.id).filter_by(jti_key=key).first() is None:
+        db.session.add(RevokedToken(jti_key=key, user_id=_user_id(payload),
+                                    revoked_at=datetime.utcnow(), expires_at=expires_at))
+    with _lock:
+        # Not loaded yet in this process: the first load will read the row
+        if _blocklist is not None:
+            _blocklist.add_token(key, _timestamp(expires_at))
+
+
+def revoke_user(user_id):
+    """Revoke every token issued to a user up to now (add to the caller's transaction)"""
+    from app import db
+    from app.database import RevokedToken
+
+    now = datetime.utcnow().replace(microsecond=0)
+    expires_at = now + timedelta(seconds=_max_token_lifetime())
+    db.session.add(RevokedToken(user_id=user_id, revoked_at=now, expires_at=expires_at))
+    with _lock:
+        if _blocklist is not None:
+            _blocklist.add_cutoff(user_id, _timestamp(now), _timestamp(expires_at))
+
+
+def _user_id(payload):
+    try:
+        return int(payload.get('sub'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _max_token_lifetime():
+    config = current_app.config
+    lifetimes = [config.get('JWT_ACCESS_TOKEN_EXPIRES'), config.get('JWT_REFRESH_TOKEN_EXPIRES')]
+    return max(int(value.total_seconds()) if isinstance(value, timedelta) else int(value or 0)
+               for value in lifetimes)
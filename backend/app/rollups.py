@@ -0,0 +1,164 @@
+"""
+Incrementally maintained summary tables.
+
+The admin dashboard and system stats read a handful of rows from
+stat_counters, and the analytics time series and per-day totals read
+estimate_rollups (per day, location, quality and floors), instead of
+scanning users and estimates. The estimate count and cost totals live in
+ESTIMATE_SHARDS counter rows each (estimates#0, estimates#1, ...): an
+insert adds to one shard picked at random, so concurrent /calculate
+requests rarely contend for the same row, and a read sums a fixed number
+of rows however large estimate_rollups grows. Every write path that
+inserts or deletes users, estimates, materials or cities applies its
+deltas in the same transaction through the helpers below; rebuild()
+recomputes everything from the base tables.
+
+Helpers take `conn`, which may be db.session or a Core connection.
+"""
+import random
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app.database import City, Estimate, EstimateRollup, Material, StatCounter, User
+
+COUNTERS = ('users', 'active_users', 'materials', 'cities')
+
+# Sharded totals: record_estimates() adds to one shard, read_counters() sums them
+SHARDED = ('estimates', 'estimate_cost')
+ESTIMATE_SHARDS = 16
+
+
+def _shards(name):
+    return [f'{name}#{shard}' for shard in range(ESTIMATE_SHARDS)]
+
+
+def upsert_increment(conn, table, keys, deltas):
+    """INSERT a row of `keys` + `deltas`, or add `deltas` to the existing row"""
+    values = dict(keys, **deltas)
+    dialect = conn.get_bind().dialect.name if hasattr(conn, 'get_bind') else conn.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update(
+            **{name: table.c[name] + stmt.inserted[name] for name in deltas})
+        conn.execute(stmt)
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: table.c[name] + stmt.excluded[name] for name in deltas})
+        conn.execute(stmt)
+    else:
+        where = [table.c[name] == value for name, value in keys.items()]
+        result = conn.execute(table.update().where(*where).values(
+            **{name: table.c[name] + delta for name, delta in deltas.items()}))
+        if result.rowcount == 0:
+            conn.execute(table.insert().values(**values))
+
+
+def bump(conn, **deltas):
+    """Add deltas to named global counters, e.g. bump(conn, users=1)"""
+    for name, delta in deltas.items():
+        if delta:
+            upsert_increment(conn, StatCounter.__table__, {'name': name}, {'value': delta})
+
+
+def record_estimates(conn, rows, sign=1):
+    """Apply inserted (sign=1) or deleted (sign=-1) estimate rows to the rollups
+
+    Each row needs `created_at`, `total_cost`, `total_area`, `location`,
+    `material_quality` and `num_floors`.
+    """
+    if not rows:
+        return
+    buckets = defaultdict(lambda: [0, 0.0, 0.0])
+    total_count, total_cost = 0, 0.0
+    for row in rows:
+        bucket = buckets[(_day(row), _get(row, 'location'), _get(row, 'material_quality'),
+                          _get(row, 'num_floors') or 1)]
+        bucket[0] += 1
+        bucket[1] += _get(row, 'total_cost') or 0
+        bucket[2] += _get(row, 'total_area') or 0
+        total_count += 1
+        total_cost += _get(row, 'total_cost') or 0
+
+    shard = random.randrange(ESTIMATE_SHARDS)
+    bump(conn, **{f'estimates#{shard}': sign * total_count,
+                  f'estimate_cost#{shard}': sign * total_cost})
+    for (day, location, quality, floors), (count, cost, area) in buckets.items():
+        upsert_increment(conn, EstimateRollup.__table__,
+                         {'day': day, 'location': location, 'material_quality': quality,
+                          'num_floors': floors},
+                         {'estimate_count': sign * count, 'total_cost': sign * cost,
+                          'total_area': sign * area})
+
+
+def read_counters(session):
+    """All global counters plus estimate totals as a dict (missing ones read as 0)"""
+    values = dict.fromkeys(COUNTERS + SHARDED, 0)
+    names = list(COUNTERS) + [shard for name in SHARDED for shard in _shards(name)]
+    for name, value in session.query(StatCounter.name, StatCounter.value) \
+            .filter(StatCounter.name.in_(names)):
+        values[name.split('#')[0]] += value
+    values['estimates'] = int(values['estimates'])
+    values['estimate_cost'] = float(values['estimate_cost'])
+    return values
+
+
+def read_day(session, day):
+    """(estimate count, total cost) of one day, summed over its rollup rows"""
+    count, cost = session.query(
+        func.sum(EstimateRollup.estimate_count), func.sum(EstimateRollup.total_cost)
+    ).filter(EstimateRollup.day == day).one()
+    return int(count or 0), float(cost or 0)
+
+
+def rebuild(session):
+    """Recompute every rollup from the base tables (for backfills and repair)"""
+    session.query(StatCounter).delete()
+    session.query(EstimateRollup).delete()
+
+    counters = {
+        'users': session.query(func.count(User.id)).scalar(),
+        'active_users': session.query(func.count(User.id)).filter(User.is_active.is_(True)).scalar(),
+        'materials': session.query(func.count(Material.id)).scalar(),
+        'cities': session.query(func.count(City.id)).scalar()
+    }
+    counters['estimates'] = session.query(func.count(Estimate.id)).scalar()
+    counters['estimate_cost'] = session.query(func.sum(Estimate.total_cost)).scalar() or 0
+    # Sharded totals start out whole in shard 0
+    session.add_all(StatCounter(name=f'{name}#0' if name in SHARDED else name, value=value or 0)
+                    for name, value in counters.items())
+
+    day = func.date(Estimate.created_at)
+    # NULL floors count as 1, like record_estimates(); coalesce before grouping
+    # so NULL and 1 land in the same rollup row
+    floors = func.coalesce(Estimate.num_floors, 1)
+    for created_on, location, quality, num_floors, count, cost, area in session.execute(
+            select(day, Estimate.location, Estimate.material_quality, floors,
+                   func.count(Estimate.id), func.sum(Estimate.total_cost), func.sum(Estimate.total_area))
+            .group_by(day, Estimate.location, Estimate.material_quality, floors)):
+        if created_on is None:
+            continue
+        if isinstance(created_on, str):
+            created_on = datetime.strptime(created_on, '%Y-%m-%d').date()
+        session.add(EstimateRollup(day=created_on, location=location, material_quality=quality,
+                                   num_floors=num_floors, estimate_count=count,
+                                   total_cost=cost or 0, total_area=area or 0))
+    session.flush()
+    return counters
+
+
+def _get(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def _day(row):
+    created_at = _get(row, 'created_at') or datetime.utcnow()
+    return created_at.date()
@@ -0,0 +1,105 @@
+"""
+Schema versioning.
+
+App startup only reads the schema version (one query). Creating tables,
+backfilling summary tables and seeding run in `python -m app.cli migrate`,
+which records SCHEMA_VERSION in schema_version when it succeeds.
+
+Bump SCHEMA_VERSION whenever models are added or changed so that existing
+databases get migrated: new tables are created by create_all(), and
+columns added to existing tables are listed in ADDED_COLUMNS. With AUTO_MIGRATE on (run.py turns it on for the
+development server; it is off otherwise) a process that finds an older
+version migrates before serving. Several workers may do so at once: the
+one that loses the race to record the version accepts the winner's.
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+
+SCHEMA_VERSION = 2
+
+# Columns added to existing tables, by the version that added them:
+# (table, column, DDL type and default)
+ADDED_COLUMNS = {
+    2: [('reprice_jobs', 'skipped', 'INTEGER NOT NULL DEFAULT 0')]
+}
+
+
+def current_version():
+    """Recorded schema version; 0 when the table does not exist yet"""
+    from app.database import SchemaVersion
+
+    try:
+        # Plain SQL: no ORM mapper configuration at startup
+        with db.engine.connect() as conn:
+            return conn.execute(text(f'SELECT MAX(version) FROM {SchemaVersion.__tablename__}')).scalar() or 0
+    except Exception:
+        # Missing table, or no database at all (in which case this raises too)
+        if inspect(db.engine).has_table(SchemaVersion.__tablename__):
+            raise
+        return 0
+
+
+def _add_columns(from_version):
+    """ALTER TABLE ... ADD COLUMN for columns newer than `from_version`"""
+    for version in sorted(ADDED_COLUMNS):
+        if version <= from_version:
+            continue
+        for table, column, ddl in ADDED_COLUMNS[version]:
+            inspector = inspect(db.engine)
+            # A missing table is created with all its columns by create_all()
+            if not inspector.has_table(table) or column in {c['name'] for c in inspector.get_columns(table)}:
+                continue
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            except Exception:
+                # Another process may have added it first
+                if column not in {c['name'] for c in inspect(db.engine).get_columns(table)}:
+                    raise
+            print(f"✅ Added {table}.{column}")
+
+
+def migrate(seed=True):
+    """Bring the database to SCHEMA_VERSION; returns True on success"""
+    from app import create_tables
+    from app.database import SchemaVersion
+
+    from_version = current_version()
+    _add_columns(from_version)
+    if not create_tables(seed=seed):
+        # A concurrent migration may have done the work (and made ours fail)
+        return current_version() >= SCHEMA_VERSION
+    if current_version() < SCHEMA_VERSION:
+        db.session.add(SchemaVersion(version=SCHEMA_VERSION, applied_at=datetime.utcnow()))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another process recorded this version first
+            db.session.rollback()
+            if current_version() < SCHEMA_VERSION:
+                raise
+    print(f"✅ Database schema at version {SCHEMA_VERSION}")
+    return True
+
+
+def check(auto_migrate=False):
+    """Startup check; migrates when behind and allowed. Returns True when current"""
+    from app import print_database_help
+
+    try:
+        version = current_version()
+    except Exception as e:
+        print_database_help(e)
+        return False
+    if version >= SCHEMA_VERSION:
+        return True
+    if not auto_migrate:
+        print(f"⚠️  Database schema is at version {version}, expected {SCHEMA_VERSION}.")
+        print("   Run: python -m app.cli migrate")
+        return False
+    print(f"🔄 Migrating database schema from version {version} to {SCHEMA_VERSION}")
+    return migrate()
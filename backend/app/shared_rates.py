@@ -0,0 +1,171 @@
+"""
+Cross-worker rate table.
+
+The RateTable used by the engine is published into a memory-mapped file
+so every WSGI worker on the host sees admin price changes without polling
+MySQL. The file starts with a small header:
+
+    magic (4s) | layout (I) | generation (Q) | payload length (Q)
+
+Writers bump the generation to an odd value, rewrite the payload and bump
+it again to the next even value (a seqlock). Readers only look at the
+8-byte generation on each request and decode the payload when it moves.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from app.engine import MATERIAL_NAMES, RateTable
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are serialized per process only
+    fcntl = None
+
+MAGIC = b'CCER'
+LAYOUT = 2
+HEADER = struct.Struct('<4sIQQ')
+GENERATION_OFFSET = 8
+HEADER_SIZE = 64
+MIN_SIZE = 64 * 1024
+
+
+def encode_table(table):
+    """Serialize a RateTable into the payload bytes"""
+    meta = json.dumps({
+        'cities': list(table.city_names),
+        'qualities': list(table.qualities),
+        'model_version': table.model_version
+    }).encode('utf-8')
+    padding = b'\0' * (-(4 + len(meta)) % 8)
+    material = table.material[:len(table.qualities)]
+    return b''.join([
+        struct.pack('<I', len(meta)), meta, padding,
+        table.labor.astype('<f8').tobytes(),
+        material.astype('<f8').tobytes(),
+        table.model.astype('<f8').tobytes()
+    ])
+
+
+def decode_table(payload):
+    """Rebuild a RateTable from payload bytes"""
+    meta_len = struct.unpack_from('<I', payload, 0)[0]
+    meta = json.loads(bytes(payload[4:4 + meta_len]).decode('utf-8'))
+    offset = 4 + meta_len + (-(4 + meta_len) % 8)
+    n_cities = len(meta['cities'])
+    floats = np.frombuffer(payload, dtype='<f8', offset=offset)
+    n_material = len(meta['qualities']) * len(MATERIAL_NAMES)
+    labor = floats[:n_cities]
+    material = floats[n_cities:n_cities + n_material]
+    model = floats[n_cities + n_material:]
+    return RateTable(meta['cities'], labor, material, qualities=meta['qualities'],
+                     model=model, model_version=meta['model_version'])
+
+
+def write_snapshot(path, table):
+    """Write `table` to a standalone file in the shared table format"""
+    payload = encode_table(table)
+    header = HEADER.pack(MAGIC, LAYOUT, 2, len(payload)).ljust(HEADER_SIZE, b'\0')
+    with open(path, 'wb') as f:
+        f.write(header + payload)
+
+
+def read_snapshot(path):
+    """Read a RateTable from a snapshot file or a live shared table file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f'{path} is not a rate table file')
+    magic, layout, generation, length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or layout != LAYOUT:
+        raise ValueError(f'{path} is not a rate table file of layout {LAYOUT}')
+    if generation == 0 or generation % 2 or HEADER_SIZE + length > len(data):
+        raise ValueError(f'{path} holds no complete rate table')
+    return decode_table(data[HEADER_SIZE:HEADER_SIZE + length])
+
+
+class SharedRateTable:
+    """Memory-mapped rate table shared by every process on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, 'r+b')
+        with self._locked():
+            if os.fstat(fd).st_size < MIN_SIZE:
+                self._file.truncate(MIN_SIZE)
+            self._map()
+            if HEADER.unpack_from(self._mm, 0)[:2] != (MAGIC, LAYOUT):
+                HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT, 0, 0)
+
+    def _map(self):
+        # Swap the reference rather than closing the old map, which other
+        # threads may still be reading; it is released once unreferenced
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def _locked(self):
+        return _FileLock(self._file, self._lock)
+
+    def generation(self):
+        """Current generation; 0 means nothing has been published yet"""
+        return struct.unpack_from('<Q', self._mm, GENERATION_OFFSET)[0]
+
+    def publish(self, table):
+        """Write a new table and return its generation"""
+        payload = encode_table(table)
+        with self._locked():
+            needed = HEADER_SIZE + len(payload)
+            if needed > len(self._mm):
+                self._file.truncate(max(needed, 2 * os.fstat(self._file.fileno()).st_size))
+                self._map()
+            generation = self.generation()
+            if generation % 2:
+                # A writer died mid-update; move past its odd value
+                generation += 1
+            struct.pack_into('<Q', self._mm, GENERATION_OFFSET, generation + 1)
+            self._mm[HEADER_SIZE:needed] = payload
+            HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT, generation + 2, len(payload))
+            return generation + 2
+
+    def read(self, retries=100):
+        """Return (generation, RateTable), or (0, None) if nothing is published"""
+        for _ in range(retries):
+            _, _, generation, length = HEADER.unpack_from(self._mm, 0)
+            if generation == 0:
+                return 0, None
+            if generation % 2:
+                time.sleep(0.0005)
+                continue
+            if HEADER_SIZE + length > len(self._mm):
+                # Another process grew the file
+                with self._lock:
+                    self._map()
+                continue
+            payload = self._mm[HEADER_SIZE:HEADER_SIZE + length]
+            if self.generation() == generation:
+                return generation, decode_table(payload)
+        raise RuntimeError('Rate table is being rewritten; try again')
+
+
+class _FileLock:
+    """Thread lock plus an advisory file lock where the OS supports it"""
+
+    def __init__(self, file, lock):
+        self._file = file
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._lock.release()
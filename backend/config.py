@@ -32,6 +32,26 @@ class Config:
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
+    # Rate limiting (app.ratelimit): token buckets per endpoint, per client
+    # IP and per signed-in user. capacity is the burst a client may send at
+    # once, per_second the rate at which the bucket refills.
+    RATE_LIMITS = {
+        'auth.login': {
+            'ip': {'capacity': 10, 'per_second': 10 / 60}
+        },
+        'auth.register': {
+            'ip': {'capacity': 5, 'per_second': 5 / 3600}
+        },
+        'estimate.calculate': {
+            'ip': {'capacity': 120, 'per_second': 4},
+            'user': {'capacity': 30, 'per_second': 1}
+        },
+        'estimate.calculate_batch': {
+            'ip': {'capacity': 20, 'per_second': 0.5},
+            'user': {'capacity': 10, 'per_second': 0.2}
+        }
+    }
+    
     # Application Settings
     APP_NAME = 'Construction Cost Estimator'
     VERSION = '1.0.0'
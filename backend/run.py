@@ -11,6 +11,9 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from dotenv import load_dotenv
 load_dotenv()
 
+# Development server: create, migrate and seed the database on startup
+os.environ.setdefault('AUTO_MIGRATE', '1')
+
 from app import create_app
 
 app = create_app()
@@ -30,7 +33,12 @@ if __name__ == '__main__':
     print("    POST   /api/auth/logout        - Logout user")
     print("  📈 Estimation:")
     print("    POST   /api/estimate/calculate - Calculate cost")
+    print("    POST   /api/estimate/calculate/batch - Calculate many projects")
+    print("    POST   /api/estimate/sweep     - Compare option combinations (not saved)")
+    print("    POST   /api/estimate/compare-cities - Rank every city for one project")
+    print("    PATCH  /api/estimate/:id       - Edit a saved estimate incrementally")
     print("    GET    /api/estimate/history   - Get estimation history")
+    print("    GET    /api/estimate/history/export - Download history (CSV/NDJSON)")
     print("    GET    /api/estimate/cities    - Get all cities")
     print("    GET    /api/estimate/materials - Get all materials (2024 prices)")
     print("  👑 Admin:")
@@ -39,8 +47,15 @@ if __name__ == '__main__':
     print("    PUT    /api/admin/materials/:id- Update material")
     print("    GET    /api/admin/cities       - Manage city rates")
     print("    PUT    /api/admin/cities/:id   - Update city")
+    print("    GET    /api/admin/cost-model   - Active cost model and versions")
+    print("    PUT    /api/admin/cost-model   - Publish a new cost model version")
     print("    GET    /api/admin/estimates    - All estimates")
+    print("    GET    /api/admin/estimates/export - Download estimates (CSV/NDJSON)")
+    print("    POST   /api/admin/reprice      - Reprice saved estimates (background job)")
     print("    GET    /api/admin/users        - User management")
+    print("    GET    /api/admin/system/cache - Estimate cache counters")
+    print("    GET    /api/admin/system/rate-limits - Rate limit budgets and counters")
+    print("    GET    /api/admin/analytics/timeseries - Estimate trends by day/week/month")
     print("\n🌍 Server running on: http://localhost:5000")
     print("🔐 Test credentials:")
     print("  • Admin: admin@example.com / admin123")
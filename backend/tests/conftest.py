@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+# Same import path as run.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# In-memory database and cheap settings; must be set before create_app()
+os.environ.update({
+    'DATABASE_URL': 'sqlite://',
+    'RATE_TABLE_PATH': '',
+    'AUTO_MIGRATE': '1',
+    'BCRYPT_LOG_ROUNDS': '4',
+    'PASSWORD_HASH_WORKERS': '0',
+    'RATE_LIMIT_ENABLED': '0'
+})
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+
+    return create_app()
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def admin_headers(client):
+    response = client.post('/api/auth/login', json={'email': 'admin@example.com', 'password': 'admin123'})
+    return {'Authorization': 'Bearer ' + response.get_json()['access_token']}
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager that counts the SQL statements executed inside it"""
+    import contextlib
+
+    from sqlalchemy import event
+
+    from app import db
+
+    @contextlib.contextmanager
+    def counter():
+        executed = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            executed.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield executed
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
@@ -0,0 +1,50 @@
+"""The admin estimate list must not issue a query per estimate or per user."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.database import Estimate, User
+
+
+def add_estimates(app, count):
+    """`count` estimates, each by a different new user"""
+    with app.app_context():
+        start = User.query.count()
+        now = datetime.utcnow()
+        for i in range(start, start + count):
+            user = User(name=f'User {i}', email=f'user{i}@example.com')
+            user.password_hash = 'x'
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Estimate(
+                user_id=user.id, project_name=f'Project {i}', total_area=1000, location='Karachi',
+                num_rooms=3, material_quality='Standard', num_floors=1, total_cost=100000,
+                created_at=now - timedelta(seconds=i)
+            ))
+        db.session.commit()
+
+
+def list_queries(client, headers, count_queries, url):
+    with count_queries() as executed:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return len(response.get_json()['estimates']), len(executed)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/admin/estimates?per_page=100',
+    '/api/admin/estimates?per_page=100&cursor=',
+])
+def test_estimate_list_query_count_is_constant(app, client, admin_headers, count_queries, url):
+    # Warm the principal cache so admin_required does not add a lookup
+    client.get('/api/admin/test', headers=admin_headers)
+
+    add_estimates(app, 5)
+    small_rows, small_queries = list_queries(client, admin_headers, count_queries, url)
+    add_estimates(app, 50)
+    large_rows, large_queries = list_queries(client, admin_headers, count_queries, url)
+
+    assert large_rows > small_rows
+    assert large_queries == small_queries
+    assert large_queries <= 2
@@ -0,0 +1,42 @@
+"""The incremental cost graph and the vectorized engine price identically."""
+import json
+
+import pytest
+
+from app import costgraph, db
+from app.database import EstimateGraph
+from app.engine import build_estimates, parse_project, price_projects
+from app.rates import get_snapshot
+
+PROJECTS = [
+    {'projectSize': 1000, 'location': 'Karachi', 'materialQuality': 'standard', 'floors': 1, 'rooms': 3},
+    {'projectSize': 2750, 'location': 'Lahore', 'materialQuality': 'premium', 'floors': 2, 'rooms': 5,
+     'ceilingHeight': '12', 'finishes': 'Yes', 'finishesQuality': 'luxury'},
+    {'projectSize': 640, 'location': 'Nowhere', 'materialQuality': 'luxury', 'floors': 3, 'rooms': 0,
+     'ceilingHeight': '14', 'finishes': 'Yes', 'finishesQuality': 'standard'}
+]
+
+
+@pytest.mark.parametrize('data', PROJECTS)
+def test_graph_matches_engine(app, data):
+    with app.app_context():
+        project = parse_project(data)
+        table = get_snapshot().table
+        values, _ = costgraph.evaluate(project, table)
+        assert costgraph.estimate_payload(values) == build_estimates(price_projects([project], table))[0]
+
+
+def test_patch_builds_graph_lazily(app, client, admin_headers):
+    response = client.post('/api/estimate/calculate', headers=admin_headers, json=PROJECTS[0])
+    estimate_id = response.get_json()['estimate']['estimate_id']
+    with app.app_context():
+        assert db.session.get(EstimateGraph, estimate_id) is None
+
+    response = client.patch(f'/api/estimate/{estimate_id}', headers=admin_headers, json={'ceilingHeight': '14'})
+    assert response.get_json()['recomputed'] == ['ceiling_multiplier', 'total']
+    with app.app_context():
+        graph = db.session.get(EstimateGraph, estimate_id)
+        assert json.loads(graph.node_values)['ceiling_height'] == '14'
+
+    response = client.patch(f'/api/estimate/{estimate_id}', headers=admin_headers, json={'rooms': 4})
+    assert response.get_json()['recomputed'] == ['rooms_total', 'total']
@@ -0,0 +1,85 @@
+"""The engine reproduces the original take-off arithmetic exactly.
+
+baseline() is the pre-engine formula, operation for operation. Any change
+to the engine's order of operations shows up here as a ±1 rounding flip.
+"""
+import random
+
+import pytest
+
+from app import costgraph
+from app.engine import build_estimates, parse_project, price_projects
+from app.rates import get_snapshot
+
+QUALITY_FACTORS = {'standard': 1.0, 'premium': 1.10, 'luxury': 1.20}
+FINISHES_RATES = {'standard': 450, 'premium': 750, 'luxury': 1300}
+CEILING_MULTIPLIERS = {'10': 1.0, '12': 1.12, '14': 1.25}
+
+
+def baseline(project, table):
+    """Cost fields and BOQ of the original calculate() for one parsed project"""
+    labor_rate = float(table.labor[table.city_row(project['location'])])
+    rates = [float(rate) for rate in table.material[table.quality_row(project['quality'])]]
+    qf = QUALITY_FACTORS.get(project['quality'], 1.0)
+    area, floors = project['area'], project['floors']
+
+    labor_cost = area * labor_rate * floors
+    effective_area = area * floors
+    quantities = [effective_area * 0.40 * qf, effective_area * 3.50 * qf, effective_area * 8,
+                  effective_area * 1.20, effective_area * 0.90]
+    costs = [quantities[0] * rates[0], quantities[1] * rates[1], (quantities[2] / 1000) * rates[2],
+             (quantities[3] / 1000) * rates[3], (quantities[4] / 1000) * rates[4]]
+    material_cost = costs[0] + costs[1] + costs[2] + costs[3] + costs[4]
+    equipment_cost = labor_cost * 0.18
+    finishes_rate = FINISHES_RATES.get(project['finishes_quality'], 450) if project['includes_finishes'] else 0
+    finishes_cost = area * finishes_rate * floors
+    sub_total = material_cost + labor_cost + equipment_cost + finishes_cost
+    other_costs = sub_total * 0.12
+    total_cost = (sub_total + other_costs) * CEILING_MULTIPLIERS.get(project['ceiling_height'], 1.0) \
+        + project['rooms'] * 60000
+    return {
+        'material_cost': round(material_cost), 'labor_cost': round(labor_cost),
+        'equipment_cost': round(equipment_cost), 'finishes_cost': round(finishes_cost),
+        'other_costs': round(other_costs), 'total_cost': round(total_cost),
+        'boq': [(round(q), round(c)) for q, c in zip(quantities, costs)]
+    }
+
+
+def random_projects(table, count, seed):
+    rng = random.Random(seed)
+    return [parse_project({
+        'projectSize': round(rng.uniform(50, 25000), rng.choice([0, 1, 2, 3])),
+        'location': rng.choice(table.city_names),
+        'materialQuality': rng.choice(['standard', 'premium', 'luxury', 'basic']),
+        'floors': rng.randint(1, 6),
+        'rooms': rng.randint(0, 12),
+        'ceilingHeight': rng.choice(['10', '12', '14', '11']),
+        'finishes': rng.choice(['Yes', 'No']),
+        'finishesQuality': rng.choice(['standard', 'premium', 'luxury'])
+    }) for _ in range(count)]
+
+
+def summary(estimate):
+    fields = ('material_cost', 'labor_cost', 'equipment_cost', 'finishes_cost', 'other_costs', 'total_cost')
+    result = {name: estimate[name] for name in fields}
+    result['boq'] = [(line['quantity'], line['total']) for line in estimate['material_boq']]
+    return result
+
+
+def test_engine_matches_baseline_arithmetic(app):
+    with app.app_context():
+        table = get_snapshot().table
+        projects = random_projects(table, 20000, seed=14)
+        estimates = build_estimates(price_projects(projects, table))
+        mismatches = [project for project, estimate in zip(projects, estimates)
+                      if summary(estimate) != baseline(project, table)]
+        assert mismatches == []
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_cost_graph_matches_baseline_arithmetic(app, seed):
+    with app.app_context():
+        table = get_snapshot().table
+        for project in random_projects(table, 200, seed):
+            values, _ = costgraph.evaluate(project, table)
+            assert summary(costgraph.estimate_payload(values)) == baseline(project, table)
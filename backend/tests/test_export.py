@@ -0,0 +1,24 @@
+"""CSV exports are safe to open in a spreadsheet."""
+import csv
+import io
+from datetime import datetime
+
+from app import db
+from app.database import Estimate, User
+
+
+def test_csv_export_neutralizes_formulas(app, client, admin_headers):
+    with app.app_context():
+        user = User.query.filter_by(email='admin@example.com').first()
+        db.session.add(Estimate(
+            user_id=user.id, project_name='=HYPERLINK("http://example.com")', total_area=900,
+            location='Karachi', num_rooms=2, material_quality='Standard', num_floors=1,
+            total_cost=-5, created_at=datetime(2030, 1, 1)
+        ))
+        db.session.commit()
+
+    response = client.get('/api/admin/estimates/export?format=csv&start=2030-01-01', headers=admin_headers)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0]['project_name'] == '\'=HYPERLINK("http://example.com")'
+    assert rows[0]['total_cost'] == '-5.0'
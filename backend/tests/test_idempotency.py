@@ -0,0 +1,35 @@
+"""Idempotency-Key claims and replays."""
+from datetime import datetime, timedelta
+
+from app import db
+from app.database import IdempotencyKey, User
+
+PROJECT = {'projectSize': 1500, 'location': 'Karachi', 'materialQuality': 'standard', 'floors': 1, 'rooms': 2}
+
+
+def claim_row(app, key, age):
+    """An unfinished claim (no stored response) made `age` ago"""
+    with app.app_context():
+        user = User.query.filter_by(email='admin@example.com').first()
+        db.session.add(IdempotencyKey(user_id=user.id, key=key, fingerprint='x',
+                                      created_at=datetime.utcnow() - age))
+        db.session.commit()
+
+
+def test_in_progress_claim_blocks_retries(app, client, admin_headers):
+    claim_row(app, 'in-progress', timedelta(seconds=1))
+    response = client.post('/api/estimate/calculate', json=PROJECT,
+                           headers=dict(admin_headers, **{'Idempotency-Key': 'in-progress'}))
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_abandoned_claim_is_taken_over_after_lease(app, client, admin_headers):
+    claim_row(app, 'abandoned', timedelta(seconds=app.config['IDEMPOTENCY_LEASE'] + 1))
+    headers = dict(admin_headers, **{'Idempotency-Key': 'abandoned'})
+    first = client.post('/api/estimate/calculate', json=PROJECT, headers=headers)
+    assert first.status_code == 200
+
+    replay = client.post('/api/estimate/calculate', json=PROJECT, headers=headers)
+    assert replay.headers.get('Idempotent-Replayed') == 'true'
+    assert replay.get_json() == first.get_json()
@@ -0,0 +1,33 @@
+"""Offline pricing turns unreadable input rows into error rows."""
+import io
+import pickle
+
+from app import offline
+from app.rates import get_snapshot
+
+
+def test_bad_jsonl_lines_become_error_rows(app):
+    source = io.StringIO(
+        '{"projectSize": 1000, "location": "Karachi", "materialQuality": "standard"}\n'
+        '{"projectSize": 1000,\n'
+        '\n'
+        '[1, 2]\n'
+        '{"projectSize": 0}\n'
+    )
+    rows = list(offline.read_rows(source, 'jsonl'))
+    # Placeholders survive the trip to pool workers
+    rows = pickle.loads(pickle.dumps(rows))
+    with app.app_context():
+        results = offline.price_rows(rows, get_snapshot().table)
+
+    assert results[0]['error'] is None and results[0]['total_cost'] > 0
+    assert results[1]['error'].startswith('line 2: invalid JSON')
+    assert results[2]['error'] == 'line 4: expected a JSON object, got list'
+    assert results[3]['error'] == 'Invalid area'
+    assert all(results[i]['total_cost'] is None for i in (1, 2, 3))
+
+
+def test_non_dict_rows_are_errors(app):
+    with app.app_context():
+        results = offline.price_rows(['oops'], get_snapshot().table)
+    assert results == [dict.fromkeys(offline.RESULT_FIELDS) | {'error': 'expected an object, got str'}]
@@ -0,0 +1,26 @@
+"""The password pool's queue limit counts hashes until they finish."""
+import time
+
+import pytest
+
+from app import passwords
+
+
+def test_timed_out_hash_keeps_its_slot_until_it_finishes(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_WORKERS', 1)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_QUEUE', 4)
+    with app.app_context():
+        # Start the worker process so the slow job is running, not queued
+        assert passwords._run(abs, -1) == 1
+        assert passwords.pool_stats()['in_flight'] == 0
+
+        monkeypatch.setitem(app.config, 'PASSWORD_HASH_TIMEOUT', 0.2)
+
+        with pytest.raises(passwords.PasswordPoolBusy):
+            passwords._run(time.sleep, 1.0)
+        assert passwords.pool_stats()['in_flight'] == 1
+
+        deadline = time.monotonic() + 5
+        while passwords.pool_stats()['in_flight'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert passwords.pool_stats()['in_flight'] == 0
@@ -0,0 +1,26 @@
+"""Role changes reach principals cached by other processes."""
+import time
+
+from app import principals
+
+
+def test_role_change_reloads_stale_principal(app, client, admin_headers):
+    response = client.post('/api/auth/register', json={
+        'name': 'Promoted', 'email': 'promoted@example.com', 'password': 'secret123'})
+    token = response.get_json()['access_token']
+    user_id = response.get_json()['user']['id']
+    headers = {'Authorization': 'Bearer ' + token}
+    assert client.get('/api/admin/users', headers=headers).status_code == 403
+
+    with app.app_context():
+        stale = (principals.get_principal(user_id), time.time() - 10)
+    response = client.put(f'/api/admin/users/{user_id}', headers=admin_headers, json={'role': 'admin'})
+    assert response.status_code == 200
+
+    # Old tokens carry the old role claim and are revoked
+    assert client.get('/api/auth/profile', headers=headers).status_code == 401
+
+    with app.app_context():
+        # What another process still holds: cached before the change
+        principals.get_cache().set(user_id, stale)
+        assert principals.get_principal(user_id)['role'] == 'admin'
@@ -0,0 +1,39 @@
+"""Rate limits charge only requests that are actually admitted and computed."""
+import pytest
+
+from app import ratelimit
+
+PROJECT = {'projectSize': 1200, 'location': 'Karachi', 'materialQuality': 'standard', 'floors': 1, 'rooms': 2}
+
+
+@pytest.fixture
+def limits(app, monkeypatch):
+    """Enable rate limiting with the given budgets for /calculate (fresh buckets)"""
+    def apply(budgets):
+        monkeypatch.setitem(app.config, 'RATE_LIMIT_ENABLED', True)
+        monkeypatch.setitem(app.config, 'RATE_LIMIT_STORE', ratelimit.MemoryStore())
+        monkeypatch.setitem(app.config, 'RATE_LIMITS', {'estimate.calculate': budgets})
+        monkeypatch.setattr(ratelimit, '_store', None)
+    return apply
+
+
+def test_replays_do_not_use_tokens(client, admin_headers, limits):
+    limits({'user': {'capacity': 1, 'per_second': 0.001}})
+    headers = dict(admin_headers, **{'Idempotency-Key': 'rate-limited-replay'})
+    assert client.post('/api/estimate/calculate', json=PROJECT, headers=headers).status_code == 200
+    for _ in range(3):
+        replay = client.post('/api/estimate/calculate', json=PROJECT, headers=headers)
+        assert replay.status_code == 200
+        assert replay.headers.get('Idempotent-Replayed') == 'true'
+    assert client.post('/api/estimate/calculate', json=PROJECT, headers=admin_headers).status_code == 429
+
+
+def test_denied_request_refunds_other_buckets(app, client, admin_headers, limits):
+    limits({'ip': {'capacity': 2, 'per_second': 0.001}, 'user': {'capacity': 1, 'per_second': 0.001}})
+    assert client.post('/api/estimate/calculate', json=PROJECT, headers=admin_headers).status_code == 200
+    for _ in range(3):
+        assert client.post('/api/estimate/calculate', json=PROJECT, headers=admin_headers).status_code == 429
+
+    # The ip bucket still holds the token the denied requests took and gave back
+    store = app.config['RATE_LIMIT_STORE']
+    assert store.take('estimate.calculate:ip:127.0.0.1', 2, 0.001)[0]
@@ -0,0 +1,44 @@
+"""Repricing copes with old rows instead of failing the whole job."""
+from datetime import datetime
+
+from app import db, reprice
+from app.database import Estimate, RepriceJob, User
+
+
+def test_reprice_fills_null_fields_and_skips_unpriceable_rows(app, monkeypatch):
+    with app.app_context():
+        user = User.query.filter_by(email='admin@example.com').first()
+        legacy = Estimate(
+            user_id=user.id, project_name='Legacy', total_area=1200, location='Karachi',
+            num_rooms=2, material_quality='Standard', total_cost=1,
+            created_at=datetime(2019, 6, 1)
+        )
+        broken = Estimate(
+            user_id=user.id, project_name='Broken', total_area=1200, location='Karachi',
+            num_rooms=2, material_quality='Standard', num_floors=1, total_cost=1,
+            created_at=datetime(2019, 6, 1)
+        )
+        db.session.add_all([legacy, broken])
+        db.session.commit()
+        legacy_id, broken_id = legacy.id, broken.id
+        # Rows saved before these columns were filled in
+        db.session.execute(Estimate.__table__.update().where(Estimate.id == legacy_id)
+                           .values(num_floors=None, ceiling_height=None, finishes_quality=None))
+        db.session.commit()
+
+        parse_project = reprice.parse_project
+
+        def parse_or_fail(data):
+            if data['projectName'] == 'Broken':
+                raise ValueError('unparseable row')
+            return parse_project(data)
+
+        monkeypatch.setattr(reprice, 'parse_project', parse_or_fail)
+        job = reprice.create_job({'start': '2019-06-01', 'end': '2019-06-01'}, chunk_size=10)
+        assert reprice.claim(job.id)
+        reprice.run_job(job.id)
+
+        job = db.session.get(RepriceJob, job.id)
+        assert (job.status, job.processed, job.skipped, job.updated) == ('completed', 2, 1, 1)
+        assert db.session.get(Estimate, legacy_id).total_cost > 1
+        assert db.session.get(Estimate, broken_id).total_cost == 1
@@ -0,0 +1,74 @@
+"""Summary tables stay consistent with the estimates they summarize."""
+from datetime import datetime
+
+from app import db, rollups
+from app.database import Estimate, EstimateRollup, StatCounter, User
+
+
+def test_rebuild_merges_null_floors_into_one_floor(app):
+    with app.app_context():
+        user = User.query.filter_by(email='admin@example.com').first()
+        day = datetime(2020, 1, 1, 12)
+        for floors in (None, 1, None):
+            db.session.add(Estimate(
+                user_id=user.id, project_name='Rollup', total_area=500, location='Lahore',
+                num_rooms=2, material_quality='Basic', num_floors=floors, total_cost=1000,
+                created_at=day
+            ))
+        db.session.commit()
+
+        rollups.rebuild(db.session)
+        db.session.commit()
+
+        rows = EstimateRollup.query.filter_by(day=day.date()).all()
+        assert [(row.num_floors, row.estimate_count, row.total_cost) for row in rows] == [(1, 3, 3000)]
+        assert rollups.read_day(db.session, day.date()) == (3, 3000.0)
+
+
+def test_estimate_totals_follow_inserts_and_deletes(app):
+    with app.app_context():
+        user = User.query.filter_by(email='admin@example.com').first()
+        before = rollups.read_counters(db.session)
+        estimate = Estimate(
+            user_id=user.id, project_name='Counter', total_area=800, location='Karachi',
+            num_rooms=3, material_quality='Standard', num_floors=2, total_cost=2500,
+            created_at=datetime.utcnow()
+        )
+        db.session.add(estimate)
+        rollups.record_estimates(db.session, [estimate])
+        db.session.commit()
+
+        after = rollups.read_counters(db.session)
+        assert after['estimates'] == before['estimates'] + 1
+        assert after['estimate_cost'] == before['estimate_cost'] + 2500
+
+        rollups.record_estimates(db.session, [estimate], sign=-1)
+        db.session.delete(estimate)
+        db.session.commit()
+        assert rollups.read_counters(db.session)['estimates'] == before['estimates']
+
+
+def test_estimate_totals_are_sharded(app, monkeypatch):
+    with app.app_context():
+        user = User.query.filter_by(email='admin@example.com').first()
+        before = rollups.read_counters(db.session)
+        shards = iter([3, 11])
+        monkeypatch.setattr(rollups.random, 'randrange', lambda n: next(shards))
+        for cost in (100, 200):
+            estimate = Estimate(
+                user_id=user.id, project_name='Shard', total_area=400, location='Lahore',
+                num_rooms=1, material_quality='Basic', num_floors=1, total_cost=cost,
+                created_at=datetime.utcnow()
+            )
+            db.session.add(estimate)
+            rollups.record_estimates(db.session, [estimate])
+        db.session.commit()
+
+        assert db.session.get(StatCounter, 'estimate_cost#11').value >= 200
+        after = rollups.read_counters(db.session)
+        assert after['estimates'] == before['estimates'] + 2
+        assert after['estimate_cost'] == before['estimate_cost'] + 300
+
+        assert rollups.rebuild(db.session)['estimates'] == after['estimates']
+        db.session.commit()
+        assert rollups.read_counters(db.session) == after
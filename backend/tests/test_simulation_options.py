@@ -0,0 +1,15 @@
+"""Malformed simulation options are client errors, not server errors."""
+import pytest
+
+PROJECT = {
+    'projectName': 'Options', 'projectSize': 1000, 'location': 'Karachi',
+    'rooms': 3, 'materialQuality': 'standard', 'floors': 1
+}
+
+
+@pytest.mark.parametrize('samples', ['abc', None, [1], 0, 10 ** 9])
+def test_invalid_samples_is_400(client, admin_headers, samples):
+    response = client.post('/api/estimate/calculate', headers=admin_headers,
+                           json=dict(PROJECT, simulate={'samples': samples}))
+    assert response.status_code == 400
+    assert 'samples' in response.get_json()['error']
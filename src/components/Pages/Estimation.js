@@ -1,6 +1,6 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { estimateAPI } from '../../services/api';
+import { estimateAPI, newIdempotencyKey } from '../../services/api';
 
 const Estimation = () => {
   const navigate = useNavigate();
@@ -9,6 +9,9 @@ const Estimation = () => {
   const [materials, setMaterials] = useState([]);
   const [activeTab, setActiveTab] = useState('form');
   const [areaWarning, setAreaWarning] = useState('');
+  // Idempotency-Key of the current form contents; kept across resubmits
+  // (double clicks, retries after a network error), replaced on any edit
+  const idempotencyKey = useRef(null);
   
   // Form state
   const [formData, setFormData] = useState({
@@ -75,6 +78,7 @@ const Estimation = () => {
 
   const handleInputChange = (e) => {
     const { name, value } = e.target;
+    idempotencyKey.current = null;
     setFormData({
       ...formData,
       [name]: value
@@ -183,7 +187,10 @@ const Estimation = () => {
     setLoading(true);
     
     try {
-      const response = await estimateAPI.calculate(formData);
+      if (!idempotencyKey.current) {
+        idempotencyKey.current = newIdempotencyKey();
+      }
+      const response = await estimateAPI.calculate(formData, idempotencyKey.current);
       
       if (response.data.success) {
         navigate('/results', { 
@@ -79,14 +79,25 @@ export const authAPI = {
   changePassword: (currentPassword, newPassword) => 
     api.post('/auth/change-password', { current_password: currentPassword, new_password: newPassword }),
   refreshToken: () => api.post('/auth/refresh'),
-  logout: () => api.post('/auth/logout'),
+  // Sends the refresh token too so the backend revokes both
+  logout: () => api.post('/auth/logout', { refresh_token: localStorage.getItem('refresh_token') }),
   validateToken: () => api.get('/auth/validate-token'),
 };
 
+// One key per form submission: resubmitting the same form (and the
+// token-refresh retry above, which reuses the request config) sends the same
+// key, so the backend replays the first estimate instead of saving a duplicate
+export const newIdempotencyKey = () =>
+  (window.crypto && window.crypto.randomUUID)
+    ? window.crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
 // ==================== ESTIMATE API ====================
 export const estimateAPI = {
   // Calculation
-  calculate: (formData) => api.post('/estimate/calculate', formData),
+  calculate: (formData, idempotencyKey) =>
+    api.post('/estimate/calculate', formData,
+      idempotencyKey ? { headers: { 'Idempotency-Key': idempotencyKey } } : undefined),
   
   // History & Details - UPDATED TO MATCH YOUR BACKEND
   getHistory: (page = 1, per_page = 10) => 